@@ -1,5 +1,6 @@
 import os
-import json
+import hashlib
+import time
 from datetime import datetime, timedelta
 from typing import Optional, Dict
 from fastapi import Depends, HTTPException, status
@@ -7,6 +8,9 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
+from app.services.cache import BoundedCache
+from app.services.metadata_store import metadata
+from app.services.workers import password_pool
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-prod")
@@ -20,6 +24,22 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2 Scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Verified Token Cache
+# Key: sha256 of the bearer token, value: its TokenData. Entry version is
+# when the entry stops being valid: the token's exp, or TOKEN_CACHE_TTL after
+# verification if that is sooner. The budget counts entries, not bytes.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 300)) # seconds
+
+token_cache = BoundedCache("tokens", max_bytes=TOKEN_CACHE_SIZE, sizer=lambda value: 1)
+
+# Resolved Users
+# Key: username, value: the UserInDB built from its users.json record. Entry
+# version is that record object; the metadata store replaces records when
+# users.json is written (register, Google sign-up) or changed on disk, which
+# makes the entry stale.
+user_cache = BoundedCache("users", max_bytes=TOKEN_CACHE_SIZE, sizer=lambda value: 1)
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -37,18 +57,14 @@ class UserInDB(User):
     hashed_password: str
 
 # Database Utility Functions
+# users.json is served from the metadata store: load_db() returns a copy to
+# read and update_db(edit) applies `edit` to the current users under the
+# file's lock, so concurrent sign-ups cannot overwrite each other
 def load_db() -> Dict[str, dict]:
-    if not os.path.exists(USERS_FILE):
-        return {}
-    with open(USERS_FILE, "r") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return {}
-
-def save_db(data: Dict[str, dict]):
-    with open(USERS_FILE, "w") as f:
-        json.dump(data, f, indent=2)
+    return metadata.load(USERS_FILE, {})
+
+def update_db(edit):
+    return metadata.update(USERS_FILE, {}, edit)
 
 def get_user(db, username: str):
     if username in db:
@@ -62,6 +78,13 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# Request handlers hash on the bounded password pool, off the event loop
+async def verify_password_async(plain_password, hashed_password):
+    return await password_pool.run(None, lambda: verify_password(plain_password, hashed_password))
+
+async def get_password_hash_async(password):
+    return await password_pool.run(None, lambda: get_password_hash(password))
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -78,6 +101,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    now = time.time()
+    entry = token_cache.get(key, lambda e: e.version > now)
+    if entry is not None:
+        return entry.value
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -86,11 +114,22 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
+    # Only verified tokens are cached, never past their expiry
+    valid_until = min(payload.get("exp") or now, now + TOKEN_CACHE_TTL)
+    if valid_until > now:
+        token_cache.put(key, token_data, version=valid_until)
     return token_data
 
 async def get_current_active_user(token_data: TokenData = Depends(get_current_user)):
-    db = load_db()
-    user = get_user(db, token_data.username)
+    # Indexed in-memory lookup, no copy of the user table per request
+    record = metadata.document(USERS_FILE, {}).get(token_data.username)
+    entry = user_cache.get(token_data.username, lambda e: e.version is record)
+    if entry is not None:
+        user = entry.value
+    else:
+        user = UserInDB(**record) if record is not None else None
+        if user is not None:
+            user_cache.put(token_data.username, user, version=record)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     if user.disabled:
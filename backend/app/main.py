@@ -4,7 +4,7 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from app.routers import upload, datasources, dashboard_config, ai, auth
+from app.routers import upload, datasources, dashboard_config, dashboard, ai, auth, admin
 
 app = FastAPI(title="SimpleBI API")
 
@@ -21,7 +21,9 @@ app.include_router(upload.router)
 app.include_router(datasources.router)
 app.include_router(auth.router)
 app.include_router(dashboard_config.router)
+app.include_router(dashboard.router)
 app.include_router(ai.router)
+app.include_router(admin.router)
 
 @app.get("/")
 def read_root():
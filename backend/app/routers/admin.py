@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.auth_utils import get_current_active_user, User, token_cache, user_cache
+from app.services.data_processing import data_cache, result_cache, rollup_cache, date_index_cache, loads, shared_frames
+from app.services.workers import query_pool, password_pool
+from app.services.ingest_jobs import ingest_jobs
+from app.services.metadata_store import metadata
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+def require_admin(current_user: User = Depends(get_current_active_user)):
+    if current_user.username != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return current_user
+
+@router.get("/cache")
+def get_cache_stats(current_user: User = Depends(require_admin)):
+    return {
+        "data": data_cache.stats(),
+        "results": result_cache.stats(),
+        "rollups": rollup_cache.stats(),
+        "date_indexes": date_index_cache.stats(),
+        "loads": loads.stats(),
+        "shared": shared_frames.stats() if shared_frames is not None else None,
+        "metadata": metadata.stats(),
+        "tokens": token_cache.stats(),
+        "users": user_cache.stats()
+    }
+
+@router.get("/workers")
+def get_worker_stats(current_user: User = Depends(require_admin)):
+    # Queue depth, admission rejections and wait/run times of the worker pools,
+    # and the state of background ingest jobs
+    return {"queries": query_pool.stats(), "logins": password_pool.stats(), "ingest": ingest_jobs.stats()}
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from google import genai
 from google.genai import types
@@ -6,8 +6,10 @@ import os
 import io
 import pandas as pd
 from typing import Optional
+from app.auth_utils import get_current_active_user, User
 from app.services.data_processing import get_full_data
-from app.routers.datasources import load_db
+from app.services.workers import query_pool
+from app.routers.datasources import datasource_source, get_datasource
 
 router = APIRouter(
     prefix="/api/ai",
@@ -21,33 +23,59 @@ class ChatRequest(BaseModel):
     message: str
     datasource_id: str
 
+def _load_context(ds: dict, username: str):
+    """
+    Loads the datasource and describes it for the prompt (runs on the query pool).
+    """
+    df = get_full_data(datasource_source(ds), owner=username, refresh_interval=ds.get("refresh_interval"))
+
+    # Optimization: Provide Schema and Sample, ask for Code.
+    
+    # Simple Schema for Code Generation
+    buffer = io.StringIO()
+    df.info(buf=buffer)
+    df_info = buffer.getvalue()
+    
+    # Sample Data
+    sample = df.head(3).to_string()
+    return df, df_info, sample
+
+def _run_analysis(code_str: str, df: pd.DataFrame):
+    """
+    Executes the generated `analyze` function (runs on the query pool).
+    Returns (result,) or None when the code does not define it.
+    """
+    local_scope = {}
+    # Execute the function definition
+    exec(code_str, {"pd": pd}, local_scope)
+    
+    # Check if function exists
+    if "analyze" not in local_scope:
+        return None
+    
+    # Run the function on a Copy-on-Write view so generated code
+    # cannot modify the shared cached frame
+    return (local_scope["analyze"](df.copy(deep=False)),)
+
 @router.post("/chat")
-async def chat_with_data(request: ChatRequest):
+async def chat_with_data(request: ChatRequest, current_user: User = Depends(get_current_active_user)):
     if not GEMINI_API_KEY:
         raise HTTPException(status_code=500, detail="Gemini API Key not configured")
 
     # 1. Load Datasource Info
-    db = load_db()
-    ds = next((d for d in db if d["id"] == request.datasource_id), None)
+    ds = get_datasource(current_user, request.datasource_id)
     if not ds:
         raise HTTPException(status_code=404, detail="Datasource not found")
 
-    # 2. Load Data
+    # 2. Load Data and 3. Prepare Context, off the event loop
     try:
-        df = get_full_data(ds["path"])
+        df, df_info, sample = await query_pool.run(
+            current_user.username, lambda: _load_context(ds, current_user.username)
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading data: {str(e)}")
-
-    # 3. Prepare Context
-    # Optimization: Provide Schema and Sample, ask for Code.
-    
-    # Simple Schema for Code Generation
-    buffer = io.StringIO()
-    df.info(buf=buffer)
-    df_info = buffer.getvalue()
-    
-    # Sample Data
-    sample = df.head(3).to_string()
     
     prompt = f"""
     You are an expert Python Data Analyst.
@@ -77,7 +105,8 @@ async def chat_with_data(request: ChatRequest):
     # 4. Call Model to Generate Code
     try:
         client = genai.Client(api_key=GEMINI_API_KEY)
-        response = client.models.generate_content(
+        # Async client: waiting on the model never blocks other requests
+        response = await client.aio.models.generate_content(
             model="gemini-flash-latest",
             contents=prompt
         )
@@ -106,29 +135,24 @@ async def chat_with_data(request: ChatRequest):
                  # It might be chatting instead of coding.
                  return {"response": ai_response_text}
 
-        # Execution Environment
-        local_scope = {}
-        
         execution_error = None
         result = None
         
         try:
-            # Execute the function definition
-            exec(code_str, {"pd": pd}, local_scope)
-            
-            # Check if function exists
-            if "analyze" not in local_scope:
+            # Generated analysis is CPU work: run it on the query pool
+            outcome = await query_pool.run(current_user.username, lambda: _run_analysis(code_str, df))
+            if outcome is None:
                 execution_error = "Error: AI did not generate a valid 'analyze' function."
                 return {"response": execution_error}
-            
-            # Run the function
-            result = local_scope["analyze"](df)
+            result = outcome[0]
             
             # Log the successful interaction
             log_interaction(request.message, prompt, code_str, str(result), token_stats=token_stats)
             
             return {"response": str(result)}
             
+        except HTTPException:
+            raise
         except Exception as exec_error:
             execution_error = str(exec_error)
             print(f"Code Execution Error: {exec_error}")
@@ -138,6 +162,8 @@ async def chat_with_data(request: ChatRequest):
             
             return {"response": f"I tried to calculate that but got an error: {execution_error}"}
             
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = str(e)
         if "429" in error_msg or "RESOURCE_EXHAUSTED" in error_msg:
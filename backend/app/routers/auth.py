@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Body
 from fastapi.security import OAuth2PasswordRequestForm
+from starlette.concurrency import run_in_threadpool
 from datetime import timedelta
 from typing import Optional
 import os
@@ -8,9 +9,9 @@ from google.oauth2 import id_token
 from google.auth.transport import requests
 
 from app.auth_utils import (
-    Token, User, UserInDB, verify_password, get_password_hash,
+    Token, User, UserInDB, get_password_hash, verify_password_async, get_password_hash_async,
     create_access_token, get_current_active_user, ACCESS_TOKEN_EXPIRE_MINUTES,
-    load_db, save_db, get_user
+    load_db, update_db, get_user
 )
 
 router = APIRouter(tags=["auth"])
@@ -18,8 +19,7 @@ router = APIRouter(tags=["auth"])
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 
 # Ensure at least one user exists for testing
-fake_db = load_db()
-if not fake_db:
+if not load_db():
     # default admin/admin
     default_user = UserInDB(
         username="admin",
@@ -28,8 +28,11 @@ if not fake_db:
         hashed_password=get_password_hash("admin"),
         disabled=False
     )
-    fake_db["admin"] = default_user.dict()
-    save_db(fake_db)
+
+    def add_admin(db):
+        if not db:
+            db["admin"] = default_user.dict()
+    update_db(add_admin)
 
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
@@ -41,7 +44,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    if not verify_password(form_data.password, user.hashed_password):
+    if not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -66,19 +69,22 @@ class UserCreate(BaseModel):
 
 @router.post("/register", response_model=User)
 async def register_user(user: UserCreate):
-    db = load_db()
-    if user.username in db:
+    if user.username in load_db():
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     user_in_db = UserInDB(
         **user.dict(),
         hashed_password=hashed_password,
         disabled=False
     )
-    
-    db[user.username] = user_in_db.dict()
-    save_db(db)
+
+    def add(db):
+        if user.username in db:
+            # Registered by a concurrent request while hashing
+            raise HTTPException(status_code=400, detail="Username already registered")
+        db[user.username] = user_in_db.dict()
+    update_db(add)
     
     # Create user directory for dashboard config
     user_dir = os.path.join("users", user.username)
@@ -92,8 +98,9 @@ class GoogleToken(BaseModel):
 @router.post("/google-token", response_model=Token)
 async def google_login(google_token: GoogleToken):
     try:
-        # Verify the token
-        idinfo = id_token.verify_oauth2_token(
+        # Verify the token (may fetch Google's certificates), off the event loop
+        idinfo = await run_in_threadpool(
+            id_token.verify_oauth2_token,
             google_token.token, 
             requests.Request(), 
             GOOGLE_CLIENT_ID
@@ -106,10 +113,8 @@ async def google_login(google_token: GoogleToken):
         # Let's use email as username for simplicity or create a derived username
         username = email # Simple strategy
         
-        db = load_db()
-        
         # Check if user exists
-        user = get_user(db, username)
+        user = get_user(load_db(), username)
         
         if not user:
             # Create user automatically
@@ -117,7 +122,7 @@ async def google_login(google_token: GoogleToken):
             # Here we set a long random string that user won't know, forcing Google Login
             import secrets
             random_password = secrets.token_urlsafe(16)
-            hashed_password = get_password_hash(random_password)
+            hashed_password = await get_password_hash_async(random_password)
             
             user_in_db = UserInDB(
                 username=username,
@@ -126,9 +131,8 @@ async def google_login(google_token: GoogleToken):
                 hashed_password=hashed_password,
                 disabled=False
             )
-            
-            db[username] = user_in_db.dict()
-            save_db(db)
+            # Unless created by a concurrent login while hashing
+            update_db(lambda db: db.setdefault(username, user_in_db.dict()))
             
             # Create user directory
             user_dir = os.path.join("users", username)
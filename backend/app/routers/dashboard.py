@@ -0,0 +1,131 @@
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from pydantic import BaseModel
+import json
+from typing import Dict, List, Optional
+from app.auth_utils import get_current_active_user, User
+from app.routers.dashboard_config import ChartConfig, get_section
+from app.routers.datasources import datasource_source, get_datasource
+from app.services.data_processing import get_query_source, query_columns, run_query, dataframe_payload
+from app.services.query_cache import query_key, cached_payload, encode_payload, etag_for, etag_matches
+from app.services.workers import query_pool
+
+router = APIRouter(prefix="/api/dashboard", tags=["dashboard"])
+
+class SectionDataRequest(BaseModel):
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    group_by: Optional[str] = 'day'
+    # chart id -> value selected in the first breakdown (cascades into the second one)
+    breakdown_filters: Dict[str, str] = {}
+
+def _chart_queries(chart: ChartConfig, request: SectionDataRequest):
+    """
+    The same queries DashboardChart used to issue one by one:
+    the main series plus up to two breakdowns.
+    """
+    base = {
+        "sort_by": chart.x_column,
+        "x_column": chart.x_column,
+        "y_column": chart.y_column,
+        "group_by": request.group_by or 'day',
+        "start_date": request.start_date,
+        "end_date": request.end_date,
+    }
+    if request.start_date or request.end_date:
+        # Time series charts use the X axis as date column unless one is configured
+        base["date_column"] = chart.date_column or chart.x_column
+    queries = {"main": dict(base, y_column_2=chart.y_column_2)}
+    if chart.breakdown_x_column:
+        queries["breakdown"] = dict(base, breakdown_column=chart.breakdown_x_column)
+    if chart.breakdown_x_column_2:
+        queries["breakdown_2"] = dict(base, breakdown_column=chart.breakdown_x_column_2)
+        selected = request.breakdown_filters.get(chart.id)
+        if selected and chart.breakdown_x_column:
+            queries["breakdown_2"].update(filter_column=chart.breakdown_x_column, filter_value=selected)
+    return queries
+
+def _json_object(items: Dict[str, bytes]) -> bytes:
+    # Splice already serialized JSON values (cached bodies) into one object
+    return b"{" + b",".join(json.dumps(name).encode("utf-8") + b":" + value for name, value in items.items()) + b"}"
+
+@router.post("/sections/{id}/data")
+async def get_section_data(id: str, body: SectionDataRequest, request: Request, current_user: User = Depends(get_current_active_user)):
+    """
+    Returns every series of every chart in a section in one response.
+    Charts are grouped by datasource so each frame is fetched once; queries
+    answer from rollups when they can and otherwise share date-filtered frames.
+    Each series goes through the query result cache; the section ETag
+    combines their keys.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    # The whole section is one job on the bounded query pool
+    return await query_pool.run(current_user.username, lambda: _section_data(id, body, current_user, if_none_match))
+
+def _section_data(id: str, body: SectionDataRequest, current_user: User, if_none_match: Optional[str]):
+    section = get_section(current_user, id)
+    if not section:
+        raise HTTPException(status_code=404, detail="Section not found")
+
+    charts = [ChartConfig(**c) for c in section.get("charts", [])]
+
+    by_datasource: Dict[str, List[ChartConfig]] = {}
+    for chart in charts:
+        by_datasource.setdefault(chart.datasource_id, []).append(chart)
+
+    # 1. Resolve data versions and query keys (no query work yet)
+    errors: Dict[str, bytes] = {}
+    plans = []
+    for datasource_id, ds_charts in by_datasource.items():
+        ds = get_datasource(current_user, datasource_id)
+        if not ds:
+            for chart in ds_charts:
+                errors[chart.id] = encode_payload({"error": "Datasource not found"})
+            continue
+        chart_queries = [(chart, _chart_queries(chart, body)) for chart in ds_charts]
+        # A projected Excel datasource is read with the columns these charts use
+        columns = set()
+        for _, queries in chart_queries:
+            for params in queries.values():
+                needed = query_columns(params)
+                columns = None if columns is None or needed is None else columns | needed
+        source = datasource_source(ds, columns)
+        try:
+            df, version = get_query_source(source, owner=current_user.username, refresh_interval=ds.get("refresh_interval"))
+        except ValueError as e:
+            for chart in ds_charts:
+                errors[chart.id] = encode_payload({"error": str(e)})
+            continue
+        for chart, queries in chart_queries:
+            queries = {
+                name: (params, query_key(source, version, params))
+                for name, params in queries.items()
+            }
+            plans.append((chart, source, df, version, queries))
+
+    keys = [key for plan in plans for _, key in plan[4].values()]
+    etag = etag_for(*keys) if not errors else None
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    # 2. Build (or fetch cached) series, sharing date-filtered frames per datasource
+    filtered: Dict[str, dict] = {}
+    results: Dict[str, bytes] = dict(errors)
+    for chart, path, df, version, queries in plans:
+        chart_result = {}
+        for name, (params, key) in queries.items():
+            try:
+                chart_result[name] = cached_payload(
+                    key, path, version,
+                    lambda params=params, path=path, df=df, version=version: dataframe_payload(run_query(
+                        path, df, version, params,
+                        owner=current_user.username,
+                        filtered_frames=filtered.setdefault(path, {})
+                    ))
+                )
+            except Exception as e:
+                print(f"Section data error for chart {chart.id} ({name}): {e}")
+                chart_result[name] = encode_payload({"error": str(e)})
+        results[chart.id] = _json_object(chart_result)
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"} if etag else None
+    return Response(content=_json_object({"charts": _json_object(results)}), media_type="application/json", headers=headers)
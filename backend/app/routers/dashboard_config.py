@@ -1,11 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List, Optional
-import json
 import os
 import uuid
 import shutil
 from app.auth_utils import get_current_active_user, User
+from app.services.metadata_store import metadata
 
 router = APIRouter(prefix="/api/dashboard-config", tags=["dashboard-config"])
 
@@ -56,105 +56,122 @@ class SectionConfigUpdate(BaseModel):
     layout_columns: Optional[int] = None
 
 def get_user_config_path(username: str):
-    user_dir = os.path.join("users", username)
-    os.makedirs(user_dir, exist_ok=True)
-    return os.path.join(user_dir, "dashboard_config.json")
+    return os.path.join("users", username, "dashboard_config.json")
 
-def load_config(user: User):
-    config_path = get_user_config_path(user.username)
-    
+def _migrate_config(user: User, config_path: str):
     # Auto-migration for admin if user config doesn't exist but legacy does
-    if not os.path.exists(config_path) and user.username == "admin" and os.path.exists(LEGACY_CONFIG_FILE):
+    if user.username == "admin" and os.path.exists(LEGACY_CONFIG_FILE):
         try:
+            os.makedirs(os.path.dirname(config_path), exist_ok=True)
             shutil.copy(LEGACY_CONFIG_FILE, config_path)
         except Exception:
             pass # Fail silently, return empty
 
-    if not os.path.exists(config_path):
-        return []
-        
-    with open(config_path, "r") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return []
+# Sections live in the metadata store. Reads use the shared cached document;
+# every edit runs on the current file under its lock (see update_config)
+def load_config(user: User):
+    config_path = get_user_config_path(user.username)
+    return metadata.document(config_path, [], lambda: _migrate_config(user, config_path))
+
+def update_config(user: User, edit):
+    """
+    Applies `edit(config)` to the user's sections and writes them atomically;
+    returns what `edit` returned. HTTPExceptions raised by `edit` abort the
+    write.
+    """
+    config_path = get_user_config_path(user.username)
+    return metadata.update(config_path, [], edit, lambda: _migrate_config(user, config_path))
 
-def save_config(data, user: User):
+def get_section(user: User, id: str) -> Optional[dict]:
+    """
+    The user's dashboard section with `id` (shared, read-only), or None.
+    """
     config_path = get_user_config_path(user.username)
-    with open(config_path, "w") as f:
-        json.dump(data, f, indent=2)
+    return metadata.find(config_path, id, [], lambda: _migrate_config(user, config_path))
+
+# Chart fields naming a datasource column
+CHART_COLUMN_FIELDS = ("x_column", "y_column", "y_column_2", "date_column", "breakdown_x_column", "breakdown_x_column_2")
+
+def chart_columns(user: User, datasource_id: str) -> List[str]:
+    """
+    Columns the user's charts on `datasource_id` read, in order of first use.
+    """
+    columns = []
+    for section in load_config(user):
+        for chart in section.get("charts", []):
+            if chart.get("datasource_id") != datasource_id:
+                continue
+            for field in CHART_COLUMN_FIELDS:
+                column = chart.get(field)
+                if column and column not in columns:
+                    columns.append(column)
+    return columns
+
+def _find_section(config: list, id: str) -> dict:
+    section = next((s for s in config if s["id"] == id), None)
+    if not section:
+        raise HTTPException(status_code=404, detail="Section not found")
+    return section
 
 @router.get("/sections", response_model=List[SectionConfig])
 def get_sections(current_user: User = Depends(get_current_active_user)):
-    config = load_config(current_user)
-    return config
+    return load_config(current_user)
 
 @router.post("/sections", response_model=SectionConfig)
 def create_section(section: SectionConfigCreate, current_user: User = Depends(get_current_active_user)):
-    config = load_config(current_user)
     new_section = {
         "id": str(uuid.uuid4()),
         "title": section.title,
         "layout_columns": section.layout_columns or 2,
         "charts": []
     }
-    config.append(new_section)
-    save_config(config, current_user)
+    update_config(current_user, lambda config: config.append(new_section))
     return new_section
 
 @router.put("/sections/{id}", response_model=SectionConfig)
 def update_section(id: str, section_update: SectionConfigUpdate, current_user: User = Depends(get_current_active_user)):
-    config = load_config(current_user)
-    section = next((s for s in config if s["id"] == id), None)
-    if not section:
-        raise HTTPException(status_code=404, detail="Section not found")
-    
-    if section_update.title is not None:
-        section["title"] = section_update.title
-    if section_update.layout_columns is not None:
-        section["layout_columns"] = section_update.layout_columns
-        
-    save_config(config, current_user)
-    return section
+    def edit(config):
+        section = _find_section(config, id)
+        if section_update.title is not None:
+            section["title"] = section_update.title
+        if section_update.layout_columns is not None:
+            section["layout_columns"] = section_update.layout_columns
+        return section
+
+    return update_config(current_user, edit)
 
 @router.delete("/sections/{id}")
 def delete_section(id: str, current_user: User = Depends(get_current_active_user)):
-    config = load_config(current_user)
-    new_config = [s for s in config if s["id"] != id]
-    if len(config) == len(new_config):
-        raise HTTPException(status_code=404, detail="Section not found")
-    save_config(new_config, current_user)
+    def edit(config):
+        remaining = [s for s in config if s["id"] != id]
+        if len(config) == len(remaining):
+            raise HTTPException(status_code=404, detail="Section not found")
+        config[:] = remaining
+
+    update_config(current_user, edit)
     return {"message": "Section deleted"}
 
 @router.post("/sections/{section_id}/charts", response_model=ChartConfig)
 def add_chart(section_id: str, chart: ChartConfigCreate, current_user: User = Depends(get_current_active_user)):
-    config = load_config(current_user)
-    section = next((s for s in config if s["id"] == section_id), None)
-    if not section:
-        raise HTTPException(status_code=404, detail="Section not found")
-    
     new_chart = chart.dict()
     new_chart["id"] = str(uuid.uuid4())
-    
-    if "charts" not in section:
-        section["charts"] = []
-    
-    section["charts"].append(new_chart)
-    save_config(config, current_user)
+
+    def edit(config):
+        section = _find_section(config, section_id)
+        section.setdefault("charts", []).append(new_chart)
+
+    update_config(current_user, edit)
     return new_chart
 
 @router.delete("/sections/{section_id}/charts/{chart_id}")
 def delete_chart(section_id: str, chart_id: str, current_user: User = Depends(get_current_active_user)):
-    config = load_config(current_user)
-    section = next((s for s in config if s["id"] == section_id), None)
-    if not section:
-        raise HTTPException(status_code=404, detail="Section not found")
-    
-    original_count = len(section.get("charts", []))
-    section["charts"] = [c for c in section["charts"] if c["id"] != chart_id]
-    
-    if len(section["charts"]) == original_count:
-         raise HTTPException(status_code=404, detail="Chart not found")
-         
-    save_config(config, current_user)
+    def edit(config):
+        section = _find_section(config, section_id)
+        charts = section.get("charts", [])
+        remaining = [c for c in charts if c["id"] != chart_id]
+        if len(remaining) == len(charts):
+            raise HTTPException(status_code=404, detail="Chart not found")
+        section["charts"] = remaining
+
+    update_config(current_user, edit)
     return {"message": "Chart deleted"}
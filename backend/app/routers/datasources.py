@@ -1,19 +1,18 @@
-from fastapi import APIRouter, HTTPException, Body, Depends
-from pydantic import BaseModel
-from typing import List, Optional
-import json
+from fastapi import APIRouter, HTTPException, Body, Depends, Request, Response, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
 import os
 import shutil
 from app.auth_utils import get_current_active_user, User
+from app.services.metadata_store import metadata
 
 router = APIRouter(prefix="/api/datasources", tags=["datasources"])
 
 GLOBAL_DB_FILE = "datasources.json"
 
 def get_user_datasource_path(username: str):
-    user_dir = os.path.join("users", username)
-    os.makedirs(user_dir, exist_ok=True)
-    return os.path.join(user_dir, "datasources.json")
+    return os.path.join("users", username, "datasources.json")
 
 class DataSource(BaseModel):
     id: str
@@ -22,6 +21,10 @@ class DataSource(BaseModel):
     type: str # 'csv', 'excel', 'database', 'google_sheets'
     path: str # File path or URL
     columns: List[str]
+    column_types: Optional[Dict[str, str]] = None # inferred at registration: datetime/numeric/category/boolean/string
+    refresh_interval: Optional[int] = None # seconds between background refreshes of remote sources (default 300)
+    sheet_name: Optional[str] = None # Excel: sheet to read (default: the first)
+    load_columns: Optional[List[str]] = None # Excel: only these columns are read for queries (default: all)
 
 
 class DataSourceCreate(BaseModel):
@@ -31,32 +34,73 @@ class DataSourceCreate(BaseModel):
     type: str
     path: str
     columns: List[str]
+    refresh_interval: Optional[int] = Field(None, ge=10)
+    sheet_name: Optional[str] = None
+    load_columns: Optional[List[str]] = None
+
+class DataSourceLoadOptions(BaseModel):
+    sheet_name: Optional[str] = None
+    load_columns: Optional[List[str]] = None
+    chart_columns: bool = False # project to the columns this datasource's charts use
 
 class PreviewURLRequest(BaseModel):
     url: str
     type: str = "google_sheets"
 
+def _migrate_db(user: User, user_path: str):
+    # Migration for Admin: Copy global file if user doesn't have one
+    if user.username == "admin" and os.path.exists(GLOBAL_DB_FILE):
+        os.makedirs(os.path.dirname(user_path), exist_ok=True)
+        shutil.copy(GLOBAL_DB_FILE, user_path)
+
+# The datasource lists live in the metadata store. Reads use the shared
+# cached document; every edit runs on the current file under its lock
 def load_db(user: User):
     user_path = get_user_datasource_path(user.username)
-    
-    # Migration for Admin: Copy global file if user doesn't have one
-    if not os.path.exists(user_path):
-        if user.username == "admin" and os.path.exists(GLOBAL_DB_FILE):
-             shutil.copy(GLOBAL_DB_FILE, user_path)
-    
-    if not os.path.exists(user_path):
-        return []
-        
-    with open(user_path, "r") as f:
-        try:
-            return json.load(f)
-        except json.JSONDecodeError:
-            return []
+    return metadata.document(user_path, [], lambda: _migrate_db(user, user_path))
 
-def save_db(data, user: User):
+def update_db(user: User, edit):
+    """
+    Applies `edit(datasources)` to the user's list and writes it atomically;
+    returns what `edit` returned.
+    """
     user_path = get_user_datasource_path(user.username)
-    with open(user_path, "w") as f:
-        json.dump(data, f, indent=2)
+    return metadata.update(user_path, [], edit, lambda: _migrate_db(user, user_path))
+
+def get_datasource(user: User, id: str) -> Optional[dict]:
+    """
+    The user's datasource record with `id` (shared, read-only), or None.
+    """
+    user_path = get_user_datasource_path(user.username)
+    return metadata.find(user_path, id, [], lambda: _migrate_db(user, user_path))
+
+def datasource_source(ds: dict, columns: Optional[set] = None) -> str:
+    """
+    Source key a datasource is loaded and cached under: an Excel datasource
+    adds its sheet, and its column projection when a query only reads
+    projected `columns` (None: all columns, i.e. the whole sheet).
+    """
+    projection = ds.get("load_columns")
+    if projection and (columns is None or not columns <= set(projection)):
+        projection = None
+    return excel_source(ds["path"], ds.get("sheet_name"), projection)
+
+def _load_sheet_schema(ds: dict, owner: str):
+    """
+    Reads the datasource's whole sheet and stores its columns and column
+    types in `ds`; 400 when the sheet or projection does not fit the source.
+    """
+    if not ds["path"].endswith(('.xls', '.xlsx')):
+        raise HTTPException(status_code=400, detail="Sheets and column projection only apply to Excel datasources")
+    try:
+        df = get_full_data(datasource_source(ds), owner=owner)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    unknown = [c for c in ds.get("load_columns") or [] if c not in df.columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Columns not in the sheet: {', '.join(unknown)}")
+    ds["columns"] = [str(c) for c in df.columns]
+    ds["column_types"] = describe_schema(df)
 
 @router.get("/", response_model=List[DataSource])
 def get_datasources(current_user: User = Depends(get_current_active_user)):
@@ -64,30 +108,83 @@ def get_datasources(current_user: User = Depends(get_current_active_user)):
 
 @router.post("/", response_model=DataSource)
 def create_datasource(ds: DataSourceCreate, current_user: User = Depends(get_current_active_user)):
-    db = load_db(current_user)
     import uuid
     new_ds = ds.dict()
     new_ds["id"] = str(uuid.uuid4())
-    db.append(new_ds)
-    save_db(db, current_user)
+
+    # Load (and for local files ingest) now: the first data request then reads
+    # the typed columnar sidecar, and the inferred schema is stored with the record
+    if new_ds["sheet_name"] is not None or new_ds["load_columns"]:
+        # Columns come from the selected sheet
+        _load_sheet_schema(new_ds, current_user.username)
+    elif is_out_of_core(new_ds["path"]):
+        # Never loaded whole: the schema comes from the first rows
+        try:
+            new_ds["column_types"] = preview_file(new_ds["path"])["column_types"]
+        except ValueError as e:
+            print(f"Preview failed for {new_ds['path']}: {e}")
+    elif new_ds["path"].startswith("http") or os.path.exists(new_ds["path"]):
+        try:
+            df = get_full_data(new_ds["path"], owner=current_user.username, refresh_interval=new_ds.get("refresh_interval"))
+            new_ds["column_types"] = describe_schema(df)
+        except ValueError as e:
+            print(f"Ingest failed for {new_ds['path']}: {e}")
+
+    update_db(current_user, lambda db: db.append(new_ds))
     return new_ds
 
+@router.put("/{id}/load-options", response_model=DataSource)
+def set_load_options(id: str, options: DataSourceLoadOptions, current_user: User = Depends(get_current_active_user)):
+    """
+    Sets the sheet and column projection of an Excel datasource. With
+    `chart_columns` the projection is the columns its charts currently use.
+    """
+    ds = get_datasource(current_user, id)
+    if not ds:
+        raise HTTPException(status_code=404, detail="Datasource not found")
+    load_columns = chart_columns(current_user, id) if options.chart_columns else options.load_columns
+    updated = dict(ds, sheet_name=options.sheet_name, load_columns=load_columns or None)
+    if updated["sheet_name"] is not None or updated["load_columns"] or ds.get("sheet_name") is not None:
+        _load_sheet_schema(updated, current_user.username)
+
+    def edit(db):
+        for d in db:
+            if d["id"] == id:
+                for field in ("sheet_name", "load_columns", "columns", "column_types"):
+                    d[field] = updated.get(field)
+                return d
+        raise HTTPException(status_code=404, detail="Datasource not found")
+
+    return update_db(current_user, edit)
+
 @router.delete("/{id}")
 def delete_datasource(id: str, current_user: User = Depends(get_current_active_user)):
-    db = load_db(current_user)
-    new_db = [d for d in db if d["id"] != id]
-    if len(db) == len(new_db):
-        raise HTTPException(status_code=404, detail="Datasource not found")
-    save_db(new_db, current_user)
+    def edit(db):
+        remaining = [d for d in db if d["id"] != id]
+        if len(db) == len(remaining):
+            raise HTTPException(status_code=404, detail="Datasource not found")
+        db[:] = remaining
+
+    update_db(current_user, edit)
     return {"message": "Datasource deleted"}
 
-from app.services.data_processing import process_file, get_full_data
-import pandas as pd
+from app.routers.dashboard_config import chart_columns
+from app.services.data_processing import (
+    preview_remote, preview_file, is_out_of_core, excel_source, get_full_data, get_query_source,
+    query_columns, run_query, dataframe_payload, UnsupportedQuery
+)
+from app.services.query_cache import query_key, cached_payload, etag_for, etag_matches
+from app.services.streaming import STREAM_FORMATS, negotiate_format, page, stream_frame
+from app.services.workers import query_pool
+from app.services.schema import describe_schema
 
 @router.post("/preview-url")
-def preview_url_datasource(request: PreviewURLRequest):
+def preview_url_datasource(request: PreviewURLRequest, current_user: User = Depends(get_current_active_user)):
+    if not request.url.startswith("http"):
+        raise HTTPException(status_code=400, detail="URL must start with http:// or https://")
     try:
-        preview = process_file(request.url)
+        # Reads only the first rows; the full download continues into the cache
+        preview = preview_remote(request.url, owner=current_user.username)
         return {"preview": preview, "url": request.url}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -95,7 +192,8 @@ def preview_url_datasource(request: PreviewURLRequest):
         raise HTTPException(status_code=500, detail=f"Error processing URL: {str(e)}")
 
 @router.get("/{id}/data")
-def get_datasource_data(id: str, 
+async def get_datasource_data(id: str, 
+                        request: Request,
                         current_user: User = Depends(get_current_active_user),
                         start_date: Optional[str] = None, 
                         end_date: Optional[str] = None, 
@@ -107,138 +205,82 @@ def get_datasource_data(id: str,
                         breakdown_column: Optional[str] = None,
                         filter_column: Optional[str] = None,
                         filter_value: Optional[str] = None,
-                        group_by: Optional[str] = 'day'):
-    db = load_db(current_user)
-    ds = next((d for d in db if d["id"] == id), None)
+                        group_by: Optional[str] = 'day',
+                        format: Optional[str] = None,
+                        limit: Optional[int] = Query(None, ge=0),
+                        offset: Optional[int] = Query(None, ge=0)):
+    """
+    Query result of a datasource. `format` (or the Accept header) selects
+    plain JSON {columns, rows} or a streamed body: ndjson, split (columnar
+    JSON) or arrow (IPC stream). `limit`/`offset` page the result rows;
+    X-Total-Count carries the unpaged row count on streamed responses.
+    """
+    try:
+        fmt = negotiate_format(format, request.headers.get("accept"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    params = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "date_column": date_column,
+        "sort_by": sort_by,
+        "x_column": x_column,
+        "y_column": y_column,
+        "y_column_2": y_column_2,
+        "breakdown_column": breakdown_column,
+        "filter_column": filter_column,
+        "filter_value": filter_value,
+        "group_by": group_by
+    }
+    if_none_match = request.headers.get("if-none-match")
+
+    # Loading and querying run on the bounded query pool, off the event loop
+    return await query_pool.run(current_user.username, lambda: _datasource_data(
+        id, current_user, params, fmt, limit, offset, if_none_match
+    ))
+
+def _datasource_data(id: str, current_user: User, params: dict, fmt: str,
+                     limit: Optional[int], offset: Optional[int], if_none_match: Optional[str]):
+    ds = get_datasource(current_user, id)
     if not ds:
         raise HTTPException(status_code=404, detail="Datasource not found")
-    
+    source = datasource_source(ds, query_columns(params))
+
     try:
-        # always use get_full_data now to ensure we have the DF for filtering/sorting
-        df = get_full_data(ds["path"])
-        
-        if date_column and (start_date or end_date) and date_column in df.columns:
-            # Clean whitespace just in case and convert
-            # using infer_datetime_format=True (deprecated in new pandas but safe usually) or just standard
-            df[date_column] = pd.to_datetime(df[date_column].astype(str).str.strip(), errors='coerce')
-            
-            # Check for NaTs
-            nat_count = df[date_column].isna().sum()
-            
-            try:
-                # Fix: Make end_date include the full day (up to 23:59:59.999)
-                start_dt = pd.to_datetime(start_date) if start_date else pd.Timestamp.min
-                end_dt = pd.to_datetime(end_date) + pd.Timedelta(days=1) if end_date else pd.Timestamp.max
-                
-                mask = (df[date_column] >= start_dt) & (df[date_column] < end_dt)
-                df = df.loc[mask]
-
-            except Exception as e:
-                pass
-        
-
-        # Arbitrary Generic Filter (for cascading breakdowns)
-        if filter_column and filter_value and filter_column in df.columns:
-            # Simple string equality for now. Could be extended.
-            # Convert column to string for comparison to be safe?
-            # Or try to infer type of filter_value?
-            # For now, let's assume categorical string filtering which is the use case.
-            df = df[df[filter_column].astype(str) == str(filter_value)]
-
-        # Aggregation Logic
-        if x_column and y_column and x_column in df.columns and y_column in df.columns:
-            try:
-                 # Ensure Y column is numeric for summing
-                 df[y_column] = pd.to_numeric(df[y_column], errors='coerce')
-                 y_cols = [y_column]
-                 if y_column_2 and y_column_2 in df.columns:
-                     df[y_column_2] = pd.to_numeric(df[y_column_2], errors='coerce')
-                     y_cols.append(y_column_2)
-                 
-                 # Handle Time Grouping
-                 group_cols = [x_column]
-
-                 if group_by in ['week', 'month']:
-                     # Ensure X is datetime for time grouping
-                     df[x_column] = pd.to_datetime(df[x_column], errors='coerce')
-                     
-                     if group_by == 'week':
-                         # Group by week (starting Monday)
-                         df[x_column] = df[x_column].dt.to_period('W').apply(lambda r: r.start_time)
-                     elif group_by == 'month':
-                         # Group by month
-                         df[x_column] = df[x_column].dt.to_period('M').apply(lambda r: r.start_time)
-                
-                 # Add breakdown column to grouping if present
-                 if breakdown_column and breakdown_column in df.columns:
-                     group_cols.append(breakdown_column)
-
-                 # Group by X (and breakdown) and sum Y, keeping columns as valid (as_index=False)
-                 df_grouped = df.groupby(group_cols, as_index=False)[y_cols].sum()
-                 
-                 # --- ZERO FILLING LOGIC START ---
-                 # Only apply if sorting by time or grouping by time is evident
-                 if group_by: # group_by acts as a proxy for time-series intent here
-                    try:
-                        # Determine Date Range
-                        # Use request params if available, else data min/max
-                        current_min = df_grouped[x_column].min()
-                        current_max = df_grouped[x_column].max()
-                         
-                        range_start = pd.to_datetime(start_date) if start_date else current_min
-                        range_end = pd.to_datetime(end_date) if end_date else current_max
-                        
-                        if pd.notna(range_start) and pd.notna(range_end):
-                            freq_map = {'day': 'D', 'week': 'W-MON', 'month': 'MS'}
-                            freq = freq_map.get(group_by, 'D')
-                            
-                            # Create full date index
-                            full_idx = pd.date_range(start=range_start, end=range_end, freq=freq)
-                            
-                            if breakdown_column and breakdown_column in df_grouped.columns:
-                                # For breakdown: pivot -> reindex -> unpivot
-                                pivot_df = df_grouped.set_index([x_column, breakdown_column])[y_column].unstack(fill_value=0)
-                                pivot_df = pivot_df.reindex(full_idx, fill_value=0)
-                                # Stack back to long format
-                                df_grouped = pivot_df.stack().reset_index()
-                                # Rename columns back to original names (stack creates 'level_1' or similar)
-                                df_grouped.columns = [x_column, breakdown_column, y_column]
-                            else:
-                                # For simple chart: set index -> reindex -> reset index
-                                df_grouped = df_grouped.set_index(x_column).reindex(full_idx, fill_value=0)
-                                df_grouped.index.name = x_column
-                                df_grouped = df_grouped.reset_index()
-                                
-                    except Exception as e:
-                        print(f"Zero-filling error: {e}")
-                        # Fallback to original grouped data if reindexing fails
-                        pass
-
-                 df = df_grouped
-                 # --- ZERO FILLING LOGIC END ---
-            except Exception as e:
-                 print(f"Aggregation error: {e}")
-                 pass # Continue without aggregation if fails
-            
-            
-        # Sorting Logic
-        if sort_by and sort_by in df.columns:
-            # Check if column is likely date to ensure proper sort
-            # (Pandas usually handles this if types are inferred, but let's be safe for common cases)
-            try:
-                # Attempt to sort
-                df = df.sort_values(by=sort_by)
-            except Exception:
-                pass # If sort fails, ignore
-
-        # Clean NaNs for JSON
-        df = df.where(pd.notnull(df), None)
-        
-        return {
-            "columns": df.columns.tolist(),
-            "rows": df.to_dict(orient="records")
-        }
+        # The cached frame is shared: queries never mutate it. It is None
+        # when an SQL engine reads the source directly (see run_query).
+        df, version = get_query_source(source, owner=current_user.username, refresh_interval=ds.get("refresh_interval"))
 
+        # Results are cached per (content version, query); the key doubles as ETag
+        key = query_key(source, version, {
+            **params,
+            "format": fmt if fmt != "json" else None,
+            "limit": limit,
+            "offset": offset
+        })
+        etag = etag_for(key)
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"} if etag else {}
+
+        if fmt != "json":
+            # Large pulls: encode row chunks as they are sent, never the whole body
+            result = run_query(source, df, version, params, owner=current_user.username)
+            headers["X-Total-Count"] = str(len(result))
+            return StreamingResponse(
+                stream_frame(page(result, offset, limit), fmt, offset=offset, total_rows=len(result)),
+                media_type=STREAM_FORMATS[fmt],
+                headers=headers
+            )
+
+        body = cached_payload(key, source, version, lambda: dataframe_payload(
+            page(run_query(source, df, version, params, owner=current_user.username), offset, limit)
+        ))
+        return Response(content=body, media_type="application/json", headers=headers or None)
+
+    except UnsupportedQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error processing file for data retrieval: {e}")
         raise HTTPException(status_code=500, detail=f"Error reading data file: {str(e)}")
@@ -1,22 +1,119 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.services.data_processing import process_file
-import shutil
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+import codecs
 import os
+import uuid
+from app.services.data_processing import preview_file, excel_row_count
+from app.services.ingest_jobs import ingest_jobs
+from app.services.workers import query_pool
 
 router = APIRouter(prefix="/api/upload", tags=["upload"])
 
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+UPLOAD_CHUNK_BYTES = 1024 * 1024 # 1 MiB
+
+# Leading bytes of each accepted format
+FILE_SIGNATURES = {
+    ".xlsx": b"PK\x03\x04", # zip container
+    ".xls": b"\xd0\xcf\x11\xe0", # OLE2 compound file
+}
+
+
+class _UploadScan:
+    """
+    Checks an upload chunk by chunk while it is written: the file signature,
+    and for CSV that the content is UTF-8 text, counting lines for a row
+    estimate (quoted line breaks make it an overestimate).
+    """
+
+    def __init__(self, extension: str):
+        self.extension = extension
+        self.size = 0
+        self.lines = 0
+        self.ends_with_newline = True
+        self._decoder = codecs.getincrementaldecoder("utf-8")() if extension == ".csv" else None
+
+    def feed(self, chunk: bytes):
+        if self.size == 0:
+            signature = FILE_SIGNATURES.get(self.extension)
+            if signature and not chunk.startswith(signature):
+                raise ValueError(f"File content is not a valid {self.extension} workbook")
+        self.size += len(chunk)
+        if self._decoder is not None:
+            if b"\x00" in chunk:
+                raise ValueError("CSV file contains binary data")
+            try:
+                self._decoder.decode(chunk)
+            except UnicodeDecodeError:
+                raise ValueError("CSV file is not UTF-8 text")
+            self.lines += chunk.count(b"\n")
+            self.ends_with_newline = chunk.endswith(b"\n")
+
+    def finish(self):
+        if self._decoder is not None:
+            try:
+                self._decoder.decode(b"", final=True)
+            except UnicodeDecodeError:
+                raise ValueError("CSV file is not UTF-8 text")
+
+    def estimated_rows(self) -> Optional[int]:
+        if self._decoder is None or self.size == 0:
+            return None
+        lines = self.lines + (0 if self.ends_with_newline else 1)
+        return max(lines - 1, 0) # header
+
+
 @router.post("/")
 async def upload_file(file: UploadFile = File(...)):
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
+    filename = os.path.basename(file.filename or "")
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in (".csv", ".xls", ".xlsx"):
+        raise HTTPException(status_code=400, detail="Unsupported file format")
+
+    file_path = os.path.join(UPLOAD_DIR, filename)
+    tmp_path = f"{file_path}.{uuid.uuid4().hex}.part"
+    scan = _UploadScan(extension)
+    try:
+        # Stream the upload to disk, validating as it goes; the file only
+        # replaces an earlier upload of the same name once it is complete
+        with open(tmp_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                scan.feed(chunk)
+                await run_in_threadpool(buffer.write, chunk)
+        scan.finish()
+        if scan.size == 0:
+            raise ValueError("Uploaded file is empty")
+        os.replace(tmp_path, file_path)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Process the file immediately to preview structure
-        preview = process_file(file_path)
-        return {"filename": file.filename, "preview": preview}
+        # Preview and schema from the first rows only; the full parse runs
+        # as a background job
+        def build_preview():
+            total_rows = scan.estimated_rows() if extension == ".csv" else excel_row_count(file_path)
+            return preview_file(file_path, total_rows)
+
+        preview = await query_pool.run(None, build_preview)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+    job = ingest_jobs.submit(file_path, preview["total_rows"])
+    return {"filename": filename, "preview": preview, "job": job.to_dict()}
+
+@router.get("/jobs/{job_id}")
+def get_ingest_job(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return job.to_dict()
@@ -0,0 +1,232 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, TypeVar
+
+import pandas as pd
+
+T = TypeVar("T")
+
+
+def dataframe_nbytes(df: pd.DataFrame) -> int:
+    """
+    Measured in-memory size of a DataFrame, including string payloads.
+    """
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+class CacheEntry:
+    """
+    A cached value plus the bookkeeping needed for validation and eviction.
+    `version` is whatever the caller uses to detect staleness (e.g. source mtime).
+    """
+    __slots__ = ("key", "value", "nbytes", "owner", "version", "loaded_at", "hits")
+
+    def __init__(self, key: str, value: Any, nbytes: int, owner: Optional[str], version: Any):
+        self.key = key
+        self.value = value
+        self.nbytes = nbytes
+        self.owner = owner
+        self.version = version
+        self.loaded_at = time.time()
+        self.hits = 0
+
+
+class BoundedCache:
+    """
+    Thread-safe in-process cache with a byte budget.
+
+    - Entries are sized once on insert with `sizer` (deep DataFrame size by default).
+    - When the budget is exceeded entries are evicted by LRU or LFU policy.
+    - `user_quota_bytes` caps how much of the budget a single owner can hold;
+      an owner over quota evicts its own entries first.
+    """
+
+    def __init__(self, name: str, max_bytes: int, user_quota_bytes: Optional[int] = None,
+                 policy: str = "lru", sizer: Callable[[Any], int] = dataframe_nbytes):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"Unknown cache policy: {policy}")
+        self.name = name
+        self.max_bytes = max_bytes
+        self.user_quota_bytes = user_quota_bytes or None
+        self.policy = policy
+        self.sizer = sizer
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._owner_bytes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    def get(self, key: str, is_fresh: Optional[Callable[[CacheEntry], bool]] = None) -> Optional[CacheEntry]:
+        """
+        Returns the entry for `key` if present and accepted by `is_fresh`, else None.
+        Stale entries are left in place until the caller replaces them with `put`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (is_fresh is not None and not is_fresh(entry)):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.hits += 1
+            return entry
+
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: str, value: Any, owner: Optional[str] = None, version: Any = None) -> CacheEntry:
+        nbytes = self.sizer(value)
+        entry = CacheEntry(key, value, nbytes, owner, version)
+        with self._lock:
+            self._remove(key)
+            if nbytes > self.max_bytes or (self.user_quota_bytes and nbytes > self.user_quota_bytes):
+                # Larger than the whole budget: hand it back without caching
+                self.rejected += 1
+                return entry
+            if owner is not None and self.user_quota_bytes:
+                while self._owner_bytes.get(owner, 0) + nbytes > self.user_quota_bytes:
+                    self._evict_one(owner)
+            while self._bytes + nbytes > self.max_bytes:
+                self._evict_one()
+            self._entries[key] = entry
+            self._bytes += nbytes
+            if owner is not None:
+                self._owner_bytes[owner] = self._owner_bytes.get(owner, 0) + nbytes
+            return entry
+
+    def pop(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            return self._remove(key)
+
+    def invalidate(self, predicate: Callable[[CacheEntry], bool]) -> int:
+        """
+        Removes every entry matching `predicate`; returns how many were removed.
+        """
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if predicate(entry)]
+            for key in stale:
+                self._remove(key)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._owner_bytes.clear()
+            self._bytes = 0
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "policy": self.policy,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "user_quota_bytes": self.user_quota_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else None,
+                "evictions": self.evictions,
+                "rejected": self.rejected,
+                "owners": dict(self._owner_bytes),
+            }
+
+    def _remove(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self._bytes -= entry.nbytes
+        if entry.owner is not None:
+            remaining = self._owner_bytes.get(entry.owner, 0) - entry.nbytes
+            if remaining > 0:
+                self._owner_bytes[entry.owner] = remaining
+            else:
+                self._owner_bytes.pop(entry.owner, None)
+        return entry
+
+    def _evict_one(self, owner: Optional[str] = None):
+        candidates = [e for e in self._entries.values() if owner is None or e.owner == owner]
+        if not candidates:
+            raise RuntimeError(f"Cache '{self.name}' has nothing left to evict")
+        if self.policy == "lfu":
+            # min() keeps the first of equal counts, i.e. the least recently used
+            victim = min(candidates, key=lambda e: e.hits)
+        else:
+            victim = candidates[0]
+        self._remove(victim.key)
+        self.evictions += 1
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one execution: the
+    first caller (leader) runs `fn`, callers arriving meanwhile wait for
+    and share its result or exception. Keys are forgotten once the call
+    completes, so later calls run again (after the caller's cache check).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.executions = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.executions += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "in_flight": len(self._flights),
+                "executions": self.executions,
+                "shared": self.shared,
+            }
@@ -0,0 +1,96 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Sorted Date Indexes
+# Per (datasource version, date column): the column's timestamps in sorted
+# order plus the row positions they come from. A date range becomes two
+# binary searches and a slice instead of two full-column comparisons.
+
+
+class DateIndex:
+    """
+    Sorted view of one datetime column of a loaded frame.
+    NaT rows are left out, as they never match a date range.
+    """
+    __slots__ = ("column", "values", "positions", "monotonic")
+
+    def __init__(self, column: str, dates: pd.Series):
+        values = dates.to_numpy()
+        valid = ~np.isnat(values)
+        self.column = column
+        # Already sorted columns (append-only logs, exports sorted by date)
+        # can be sliced directly and need no position array
+        self.monotonic = bool(valid.all() and dates.is_monotonic_increasing)
+        if self.monotonic:
+            self.values = values
+            self.positions = None
+        else:
+            positions = np.flatnonzero(valid)
+            order = np.argsort(values[positions], kind="stable")
+            self.values = values[positions][order]
+            self.positions = positions[order]
+
+    def extended(self, dates: pd.Series, offset: int) -> "DateIndex":
+        """
+        Index of the column after `dates` were appended to it as rows
+        offset, offset + 1, ... Both parts are already sorted runs, so the
+        stable sort is a linear merge rather than a full re-sort.
+        """
+        values = dates.to_numpy()
+        valid = ~np.isnat(values)
+        current = self.values.astype(values.dtype, copy=False)
+        index = DateIndex.__new__(DateIndex)
+        index.column = self.column
+        index.monotonic = bool(
+            self.monotonic and valid.all() and dates.is_monotonic_increasing
+            and (len(current) == 0 or len(values) == 0 or values[0] >= current[-1])
+        )
+        if index.monotonic:
+            index.values = np.concatenate([current, values])
+            index.positions = None
+            return index
+        positions = np.flatnonzero(valid)
+        order = np.argsort(values[positions], kind="stable")
+        current_positions = self.positions if self.positions is not None else np.arange(len(current))
+        merged_values = np.concatenate([current, values[positions][order]])
+        merged_positions = np.concatenate([current_positions, offset + positions[order]])
+        merge = np.argsort(merged_values, kind="stable")
+        index.values = merged_values[merge]
+        index.positions = merged_positions[merge]
+        return index
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.values.nbytes + (self.positions.nbytes if self.positions is not None else 0))
+
+    def _bound(self, ts: pd.Timestamp) -> np.datetime64:
+        # Compare in the column's own resolution
+        return pd.Timestamp(ts).as_unit(np.datetime_data(self.values.dtype)[0]).to_datetime64()
+
+    def rows_between(self, start_dt: Optional[pd.Timestamp], end_dt: Optional[pd.Timestamp]):
+        """
+        Row positions with start_dt <= date < end_dt, in original row order
+        (a slice when the column is already sorted). None bounds are open.
+        """
+        lo = 0 if start_dt is None else int(np.searchsorted(self.values, self._bound(start_dt), side="left"))
+        hi = len(self.values) if end_dt is None else int(np.searchsorted(self.values, self._bound(end_dt), side="left"))
+        hi = max(lo, hi)
+        if self.positions is None:
+            return slice(lo, hi)
+        # Sorting k positions keeps the row order of the mask-based filter
+        return np.sort(self.positions[lo:hi])
+
+
+def build_date_index(df: pd.DataFrame, column: str) -> Optional[DateIndex]:
+    """
+    DateIndex for `column`, or None when it is not a datetime column
+    (those are still converted and masked per request).
+    """
+    if column not in df.columns:
+        return None
+    dates = df[column]
+    if not pd.api.types.is_datetime64_any_dtype(dates) or getattr(dates.dt, "tz", None) is not None:
+        return None
+    return DateIndex(column, dates)
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from app.services.data_processing import get_full_data, ingest_file, is_out_of_core, loads
+
+# Background Ingest Jobs
+# After an upload is stored and previewed, the full parse (source -> typed
+# Parquet sidecar -> cached frame and rollups) runs here. Clients poll
+# GET /api/upload/jobs/{id} for progress; a datasource created meanwhile
+# joins the running ingest instead of starting its own.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+INGEST_JOB_HISTORY = 200 # finished jobs kept for polling
+
+
+class IngestJob:
+    __slots__ = ("id", "path", "state", "bytes_read", "total_bytes", "rows", "estimated_rows",
+                 "error", "created_at", "started_at", "finished_at")
+
+    def __init__(self, path: str, estimated_rows: Optional[int]):
+        self.id = str(uuid.uuid4())
+        self.path = path
+        self.state = "queued" # queued -> parsing -> loading -> done | failed
+        self.bytes_read = 0
+        self.total_bytes = None
+        self.rows = None
+        self.estimated_rows = estimated_rows
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def advance(self, bytes_read: int, total_bytes: int):
+        self.bytes_read = bytes_read
+        self.total_bytes = total_bytes
+
+    def to_dict(self) -> dict:
+        if self.state in ("loading", "done"):
+            progress = 1.0
+        elif self.total_bytes:
+            progress = min(self.bytes_read / self.total_bytes, 1.0)
+        else:
+            progress = 0.0
+        return {
+            "id": self.id,
+            "path": self.path,
+            "state": self.state,
+            "progress": round(progress, 3),
+            "rows": self.rows,
+            "estimated_rows": self.estimated_rows,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestJobs:
+    """
+    Runs ingest jobs on a small dedicated pool and remembers the latest
+    `history` of them.
+    """
+
+    def __init__(self, workers: int, history: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self.history = history
+
+    def submit(self, path: str, estimated_rows: Optional[int] = None) -> IngestJob:
+        job = IngestJob(path, estimated_rows)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: IngestJob):
+        job.started_at = time.time()
+        job.state = "parsing"
+        try:
+            if is_out_of_core(job.path):
+                # Queried in chunks straight from the CSV, nothing to ingest
+                job.rows = job.estimated_rows
+                job.state = "done"
+                return
+            # A re-uploaded file has a new mtime; its old sidecar is only reused
+            # (and extended) when the new file just appends rows to it
+            loads.do(("ingest", job.path), lambda: ingest_file(job.path, progress=job.advance))
+            job.state = "loading"
+            job.rows = len(get_full_data(job.path))
+            job.state = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.state = "failed"
+            print(f"Ingest failed for {job.path}: {e}")
+        finally:
+            job.finished_at = time.time()
+
+    def stats(self) -> dict:
+        with self._lock:
+            states = {}
+            for job in self._jobs.values():
+                states[job.state] = states.get(job.state, 0) + 1
+            return {"jobs": len(self._jobs), "states": states}
+
+
+ingest_jobs = IngestJobs(INGEST_WORKERS, INGEST_JOB_HISTORY)
@@ -0,0 +1,193 @@
+import copy
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError: # Windows: edits are only serialized within this process
+    fcntl = None
+
+# Metadata Store
+# users.json and the per-user datasources.json / dashboard_config.json are
+# parsed once and kept in memory with an id index. Writes go through the
+# store (write-through), so this process sees its own changes at once.
+# Changes made by another worker are picked up when the file is rechecked
+# (one stat per document every METADATA_RECHECK_SECONDS); between rechecks
+# a lookup touches no disk.
+# Edits run under a per-file lock (threads and worker processes) on a fresh
+# copy of the document and are written to a temp file that replaces the
+# original, so concurrent edits are not lost and a crash never leaves a
+# truncated file behind.
+METADATA_RECHECK_SECONDS = float(os.getenv("METADATA_RECHECK_SECONDS", 2))
+
+
+class _Document:
+    __slots__ = ("data", "index", "stamp", "checked_at")
+
+    def __init__(self, data: Any, stamp: Optional[tuple]):
+        self.data = data
+        # Lists of records ({"id": ...}) are indexed by id; dicts are keyed already
+        if isinstance(data, list):
+            self.index = {item["id"]: item for item in data if isinstance(item, dict) and "id" in item}
+        else:
+            self.index = data
+        self.stamp = stamp
+        self.checked_at = time.monotonic()
+
+
+def _stamp(path: str) -> Optional[tuple]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class MetadataStore:
+    """
+    Write-through cache of JSON metadata documents.
+
+    `document()` and `find()` return the shared cached objects, which must be
+    treated as read-only; changes go through `update()` (or `save()`).
+    """
+
+    def __init__(self, recheck_seconds: float):
+        self.recheck_seconds = recheck_seconds
+        self._docs: Dict[str, _Document] = {}
+        self._lock = threading.RLock()
+        self._path_locks: Dict[str, threading.Lock] = {}
+        self.hits = 0
+        self.reads = 0
+        self.writes = 0
+        self.edits = 0
+
+    def _read(self, path: str, default: Any) -> _Document:
+        stamp = _stamp(path)
+        data = copy.deepcopy(default)
+        if stamp is not None:
+            with open(path, "r") as f:
+                try:
+                    data = json.load(f)
+                except json.JSONDecodeError as e:
+                    # Keep the damaged file for recovery instead of letting
+                    # the next edit overwrite it
+                    print(f"Invalid JSON in {path}, moved aside: {e}")
+                    os.replace(path, f"{path}.corrupt-{int(time.time())}")
+                    stamp = None
+        self.reads += 1
+        return _Document(data, stamp)
+
+    @contextmanager
+    def _locked(self, path: str):
+        with self._lock:
+            lock = self._path_locks.setdefault(path, threading.Lock())
+        with lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path + ".lock", "a") as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _write(self, path: str, data: Any):
+        # Caller holds the path lock
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with self._lock:
+            self._docs[path] = _Document(data, _stamp(path))
+            self.writes += 1
+
+    def _get(self, path: str, default: Any, on_missing: Optional[Callable[[], None]] = None) -> _Document:
+        doc = self._docs.get(path)
+        if doc is not None and time.monotonic() - doc.checked_at < self.recheck_seconds:
+            self.hits += 1
+            return doc
+        with self._lock:
+            doc = self._docs.get(path)
+            if doc is not None:
+                stamp = _stamp(path)
+                if stamp == doc.stamp:
+                    doc.checked_at = time.monotonic()
+                    self.hits += 1
+                    return doc
+            elif on_missing is not None and not os.path.exists(path):
+                on_missing()
+            doc = self._read(path, default)
+            self._docs[path] = doc
+            return doc
+
+    def document(self, path: str, default: Any, on_missing: Optional[Callable[[], None]] = None) -> Any:
+        """
+        The parsed document at `path` (shared, read-only), or `default` when
+        the file is missing or not valid JSON. `on_missing` runs before the
+        first read when the file does not exist yet (e.g. to migrate it).
+        """
+        return self._get(path, default, on_missing).data
+
+    def find(self, path: str, id: str, default: Any, on_missing: Optional[Callable[[], None]] = None) -> Optional[dict]:
+        """
+        The record with `id` in the document at `path` (shared, read-only).
+        """
+        return self._get(path, default, on_missing).index.get(id)
+
+    def load(self, path: str, default: Any, on_missing: Optional[Callable[[], None]] = None) -> Any:
+        """
+        A private copy of the document at `path` for editing.
+        """
+        return copy.deepcopy(self._get(path, default, on_missing).data)
+
+    def save(self, path: str, data: Any):
+        """
+        Replaces the document at `path` with `data` and caches it.
+        Prefer `update()` for edits, which cannot lose concurrent changes.
+        """
+        with self._locked(path):
+            self._write(path, data)
+
+    def update(self, path: str, default: Any, edit: Callable[[Any], Any],
+               on_missing: Optional[Callable[[], None]] = None) -> Any:
+        """
+        Applies `edit` to the current document at `path` under its lock and
+        writes the result, returning what `edit` returned. `edit` changes
+        the document in place (one section, chart or record); if it raises,
+        nothing is written.
+        """
+        with self._locked(path):
+            if on_missing is not None and not os.path.exists(path):
+                on_missing()
+            # Re-read under the lock: another worker may have just written
+            data = self._read(path, default).data
+            result = edit(data)
+            self._write(path, data)
+            self.edits += 1
+            return result
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self._docs),
+            "recheck_seconds": self.recheck_seconds,
+            "hits": self.hits,
+            "reads": self.reads,
+            "writes": self.writes,
+            "edits": self.edits,
+        }
+
+
+metadata = MetadataStore(METADATA_RECHECK_SECONDS)
@@ -0,0 +1,62 @@
+import hashlib
+import json
+from typing import Any, Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.services.data_processing import result_cache
+
+
+def result_cache_key(file_path: str, version: Any, params: dict) -> str:
+    """
+    Stable key for a query: unset params are dropped and keys sorted, so
+    equivalent requests share an entry.
+    """
+    normalized = {k: v for k, v in sorted(params.items()) if v not in (None, "")}
+    raw = json.dumps([file_path, version, normalized], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def encode_payload(payload: dict) -> bytes:
+    """
+    Serializes a payload exactly as FastAPI would for a returned dict.
+    """
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def cached_payload(key: Optional[str], file_path: str, version: Any, compute: Callable[[], dict]) -> bytes:
+    """
+    Returns the JSON body for a query, computing and caching it on a miss.
+    Nothing is cached when key is None (content version unknown).
+    """
+    if key is None:
+        return encode_payload(compute())
+    entry = result_cache.get(key)
+    if entry is not None:
+        return entry.value
+    body = encode_payload(compute())
+    result_cache.put(key, body, version=(file_path, version))
+    return body
+
+
+def query_key(file_path: str, version: Any, params: dict) -> Optional[str]:
+    return result_cache_key(file_path, version, params) if version is not None else None
+
+
+def etag_for(*keys: Optional[str]) -> Optional[str]:
+    """
+    Strong ETag for one or more result keys; None if any result is uncacheable.
+    """
+    if not keys or any(k is None for k in keys):
+        return None
+    if len(keys) == 1:
+        return f'"{keys[0]}"'
+    return '"' + hashlib.sha1("|".join(keys).encode("utf-8")).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    if not if_none_match or not etag:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
@@ -0,0 +1,115 @@
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.services.time_buckets import bucket_dates
+
+# Rollup Cubes
+# (date_column, dimension or None) -> day-level sums of every numeric measure.
+# Only built for datetime columns holding whole days, so a day rollup row
+# stands for exactly the raw rows of that date. Dimensions are the
+# category-typed columns (low cardinality by construction, see schema.py).
+Rollups = Dict[Tuple[str, Optional[str]], pd.DataFrame]
+
+
+def build_rollups(df: pd.DataFrame) -> Rollups:
+    """
+    Materializes day-level rollups per (date column, dimension) for a loaded
+    frame. Coarser granularities are derived from these at query time.
+    """
+    measures = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    if not measures:
+        return {}
+    dimensions = [c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+
+    rollups: Rollups = {}
+    for date_column in df.columns:
+        dates = df[date_column]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            continue
+        valid = dates.dropna()
+        if valid.empty or not (valid == valid.dt.normalize()).all():
+            continue
+        rollups[(date_column, None)] = df.groupby(date_column, as_index=False)[measures].sum()
+        for dimension in dimensions:
+            rollups[(date_column, dimension)] = (
+                df.groupby([date_column, dimension], as_index=False, observed=True)[measures].sum()
+            )
+    return rollups
+
+
+def extend_rollups(rollups: Rollups, rows: pd.DataFrame) -> Rollups:
+    """
+    Rollups of a frame after `rows` were appended to it, from its previous
+    rollups and the new rows only. `rows` has the dtypes of the extended
+    frame (category columns on its combined categories). A date column whose
+    new rows are not whole days drops out, as it would from build_rollups.
+    """
+    extended: Rollups = {}
+    for (date_column, dimension), rollup in rollups.items():
+        dates = rows[date_column].dropna()
+        if not (dates == dates.dt.normalize()).all():
+            continue
+        keys = [date_column] + ([dimension] if dimension else [])
+        measures = [c for c in rollup.columns if c not in keys]
+        if dimension is not None:
+            categories = rows[dimension].cat.categories
+            rollup = rollup.assign(**{dimension: rollup[dimension].cat.set_categories(categories)})
+        added = rows.groupby(keys, as_index=False, observed=True)[measures].sum()
+        extended[(date_column, dimension)] = (
+            pd.concat([rollup, added], ignore_index=True)
+            .groupby(keys, as_index=False, observed=True)[measures].sum()
+        )
+    return extended
+
+
+def rollups_nbytes(rollups: Rollups) -> int:
+    return int(sum(frame.memory_usage(deep=True, index=True).sum() for frame in rollups.values()))
+
+
+def aggregate_from_rollups(rollups: Rollups,
+                           x_column: str,
+                           y_cols: List[str],
+                           breakdown_column: Optional[str] = None,
+                           filter_column: Optional[str] = None,
+                           filter_value: Optional[str] = None,
+                           date_column: Optional[str] = None,
+                           start_date: Optional[str] = None,
+                           end_date: Optional[str] = None,
+                           group_by: Optional[str] = 'day') -> Optional[pd.DataFrame]:
+    """
+    Answers "sum of y_cols by bucketed x_column [and breakdown_column]" from
+    a rollup, returning the same frame the raw groupby would produce
+    (before zero-filling), or None when the query shape is not covered.
+    Arguments are the effective ones: columns missing from the datasource
+    must already be dropped by the caller.
+    """
+    if date_column is not None and date_column != x_column:
+        return None
+    dimensions = {c for c in (breakdown_column, filter_column) if c is not None}
+    if len(dimensions) > 1 or x_column in dimensions:
+        return None
+    if len(set(y_cols)) != len(y_cols) or dimensions.intersection(y_cols):
+        return None
+    if filter_column is not None and str(filter_value) == 'nan':
+        return None # NaN keys are not kept in rollups
+
+    rollup = rollups.get((x_column, next(iter(dimensions), None)))
+    if rollup is None or any(y not in rollup.columns or y == x_column for y in y_cols):
+        return None
+
+    if date_column is not None:
+        try:
+            # Same bounds as filter_date_range (end_date covers its whole day)
+            start_dt = pd.to_datetime(start_date) if start_date else pd.Timestamp.min
+            end_dt = pd.to_datetime(end_date) + pd.Timedelta(days=1) if end_date else pd.Timestamp.max
+            rollup = rollup.loc[(rollup[x_column] >= start_dt) & (rollup[x_column] < end_dt)]
+        except Exception:
+            return None
+
+    if filter_column is not None:
+        rollup = rollup[rollup[filter_column].astype(str) == str(filter_value)]
+
+    group_cols = [x_column] + ([breakdown_column] if breakdown_column else [])
+    work = rollup[group_cols + y_cols].assign(**{x_column: bucket_dates(rollup[x_column], group_by)})
+    return work.groupby(group_cols, as_index=False, observed=True)[y_cols].sum()
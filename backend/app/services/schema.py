@@ -0,0 +1,167 @@
+from typing import Dict, Optional
+
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+# Column kinds persisted with each datasource ("column_types")
+DATETIME = "datetime"
+NUMERIC = "numeric"
+CATEGORY = "category"
+BOOLEAN = "boolean"
+STRING = "string"
+
+# A string column becomes `category` when it repeats enough values
+CATEGORY_MAX_UNIQUE = 1000
+CATEGORY_MAX_RATIO = 0.5
+
+# Rows probed before attempting a full-column date parse
+DATE_PROBE_ROWS = 100
+
+# Directives a date format must contain (a year and a month): text such as
+# "January" or "10:30" would otherwise parse onto a default year or day
+DATE_REQUIRED_DIRECTIVES = (("%Y", "%y"), ("%m", "%b", "%B"))
+
+
+def _kind_of(series: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(series):
+        return BOOLEAN
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return DATETIME
+    if pd.api.types.is_numeric_dtype(series):
+        return NUMERIC
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return CATEGORY
+    return STRING
+
+
+def _is_canonical_number(value) -> bool:
+    # Numeric text must read the way the number prints back: "00123",
+    # "1.50" or "1e3" stay text (codes, formatted values)
+    if not isinstance(value, str):
+        return not isinstance(value, bool)
+    for convert in (int, float):
+        try:
+            return str(convert(value)) == value
+        except ValueError:
+            continue
+    return False
+
+
+def date_format(values: pd.Series) -> Optional[str]:
+    """
+    Date format of a raw column, guessed from its first non-null value, or
+    None when that value does not read as a date with a year and a month.
+    """
+    values = values.dropna()
+    if values.empty or not isinstance(values.iloc[0], str):
+        return None
+    fmt = guess_datetime_format(values.iloc[0].strip())
+    if fmt is None or not all(any(d in fmt for d in group) for group in DATE_REQUIRED_DIRECTIVES):
+        return None
+    return fmt
+
+
+def _parse_dates(values: pd.Series, fmt: str) -> pd.Series:
+    # An explicit format parses every value the same way or not at all
+    return pd.to_datetime(values.astype(str).str.strip(), format=fmt, errors='coerce')
+
+
+def _infer_column(series: pd.Series):
+    """
+    Returns (kind, converted_series or None) for a single raw column.
+    Conversions are lossless: every non-null value must convert, numbers
+    must be written canonically and dates must match one format.
+    """
+    kind = _kind_of(series)
+    if kind != STRING:
+        return kind, None
+
+    values = series.dropna()
+    if values.empty:
+        return STRING, None
+
+    numbers = pd.to_numeric(values, errors='coerce')
+    if numbers.notna().all() and values.map(_is_canonical_number).all():
+        return NUMERIC, pd.to_numeric(series, errors='coerce')
+
+    fmt = date_format(values)
+    if fmt is not None and _parse_dates(values.head(DATE_PROBE_ROWS), fmt).notna().all():
+        dates = _parse_dates(series, fmt)
+        if dates[series.notna()].notna().all():
+            return DATETIME, dates
+
+    unique_count = values.nunique()
+    if unique_count <= CATEGORY_MAX_UNIQUE and unique_count <= len(values) * CATEGORY_MAX_RATIO:
+        return CATEGORY, series.astype("category")
+
+    return STRING, None
+
+
+def infer_schema(df: pd.DataFrame):
+    """
+    Infers column kinds for a freshly parsed frame and returns
+    (typed_frame, column_types). Dates become datetime64, numeric strings
+    become numbers and low-cardinality strings become `category`.
+    Run once at load time; cached frames are already typed.
+    """
+    column_types: Dict[str, str] = {}
+    converted = {}
+    for column in df.columns:
+        kind, series = _infer_column(df[column])
+        column_types[str(column)] = kind
+        if series is not None:
+            converted[column] = series
+    if converted:
+        df = df.copy(deep=False)
+        for column, series in converted.items():
+            df[column] = series
+    return df, column_types
+
+
+def conform_rows(rows: pd.DataFrame, like: pd.DataFrame, head: pd.DataFrame):
+    """
+    Types new raw rows (parsed as strings) like the already typed frame
+    `like`, so they can be appended to it without re-inferring its columns.
+    `head` holds the first raw rows `like` was parsed from; date columns
+    parse the new rows in the format guessed from it.
+    Returns (rows, like) with the category columns of both on their combined
+    categories, or None when a value does not convert or a category column
+    outgrows the category limits: a full inference would type it differently.
+    """
+    rows = rows.copy(deep=False)
+    like = like.copy(deep=False)
+    for column in like.columns:
+        kind = _kind_of(like[column])
+        values = rows[column]
+        present = values.notna()
+        if kind == NUMERIC:
+            converted = pd.to_numeric(values, errors='coerce')
+        elif kind == DATETIME:
+            fmt = date_format(head[column])
+            if fmt is None:
+                return None # first value of the column not in `head`
+            converted = _parse_dates(values, fmt)
+        elif kind == BOOLEAN:
+            if not present.all():
+                return None # missing values make the column object
+            converted = values.str.lower().map({"true": True, "false": False})
+        elif kind == CATEGORY:
+            categories = like[column].cat.categories.union(pd.Index(values[present].unique()))
+            non_null = int(like[column].notna().sum() + present.sum())
+            if len(categories) > CATEGORY_MAX_UNIQUE or len(categories) > non_null * CATEGORY_MAX_RATIO:
+                return None
+            like[column] = like[column].cat.set_categories(categories)
+            converted = values.astype(pd.CategoricalDtype(categories))
+        else:
+            converted = values
+        if converted[present].isna().any():
+            return None
+        rows[column] = converted
+    return rows, like
+
+
+def describe_schema(df: pd.DataFrame) -> Dict[str, str]:
+    """
+    Column kinds of an already typed frame (dtype lookup only).
+    """
+    return {str(column): _kind_of(df[column]) for column in df.columns}
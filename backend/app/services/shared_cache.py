@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError: # Windows: no cross-process locking, each worker may load on its own
+    fcntl = None
+
+# Shared Frame Store
+# Loaded frames are also written as uncompressed Arrow IPC files, keyed by
+# (source path, version). Every uvicorn worker memory-maps the same file,
+# so a frame is parsed once per host and its column buffers live in the
+# shared page cache instead of being copied into each process.
+# manifest.json tracks the files (source, version, bytes, created); it is
+# rewritten under an exclusive file lock.
+
+
+class SharedFrameStore:
+    """
+    Cross-process tier below the in-process data cache.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def _key(self, file_path: str, version: Any) -> str:
+        return hashlib.sha1(json.dumps([file_path, version], default=str).encode("utf-8")).hexdigest()[:24]
+
+    @contextmanager
+    def _file_lock(self, name: str):
+        # flock is per open file, so it also serializes threads of this process
+        if fcntl is None:
+            with self._lock:
+                yield
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{name}.lock"), "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r") as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            manifest = {}
+        manifest.setdefault("entries", {})
+        return manifest
+
+    def _write_manifest(self, manifest: dict):
+        with open(self.manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(self.manifest_path + ".tmp", self.manifest_path)
+
+    def get(self, file_path: str, version: Any) -> Optional[pd.DataFrame]:
+        """
+        The shared frame for (file_path, version), memory-mapped, or None.
+        """
+        path = os.path.join(self.directory, self._key(file_path, version) + ".arrow")
+        try:
+            source = pa.memory_map(path, "r")
+            table = pa.ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowInvalid):
+            self.misses += 1
+            return None
+        self.hits += 1
+        # split_blocks keeps numeric columns as views of the mapped buffers
+        return table.to_pandas(split_blocks=True)
+
+    def put(self, file_path: str, version: Any, df: pd.DataFrame):
+        """
+        Publishes a frame for other workers; replaces other versions of the
+        same source and evicts the oldest files above max_bytes.
+        """
+        key = self._key(file_path, version)
+        path = os.path.join(self.directory, key + ".arrow")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            # Unique per process and thread: put also runs outside the key
+            # lock (remote refreshes), so two threads may publish one key
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with pa.OSFile(tmp_path, "wb") as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        writer.write_table(table)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            self.writes += 1
+
+            with self._file_lock("manifest"):
+                manifest = self._read_manifest()
+                entries = manifest["entries"]
+                stale = [k for k, e in entries.items() if e["source"] == file_path and k != key]
+                entries[key] = {
+                    "source": file_path,
+                    "version": version,
+                    "file": os.path.basename(path),
+                    "bytes": os.path.getsize(path),
+                    "created": time.time()
+                }
+                total = sum(e["bytes"] for e in entries.values())
+                for k in sorted(entries, key=lambda k: entries[k]["created"]):
+                    if total <= self.max_bytes or k == key:
+                        continue
+                    stale.append(k)
+                    total -= entries[k]["bytes"]
+                for k in stale:
+                    entry = entries.pop(k, None)
+                    if entry is None:
+                        continue
+                    # Workers that mapped the file keep their mapping
+                    for name in (entry["file"], f"{k}.lock"):
+                        try:
+                            os.remove(os.path.join(self.directory, name))
+                        except OSError:
+                            pass
+                self._write_manifest(manifest)
+        except Exception as e:
+            # The shared tier is an optimization only
+            print(f"Shared cache write failed for {file_path}: {e}")
+
+    def get_or_load(self, file_path: str, version: Any, load: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        """
+        The shared frame for (file_path, version), loading and publishing it
+        on a miss. A per-key file lock makes concurrent workers wait for the
+        one that is loading instead of parsing the source again.
+        """
+        df = self.get(file_path, version)
+        if df is not None:
+            return df
+        with self._file_lock(self._key(file_path, version)):
+            df = self.get(file_path, version)
+            if df is not None:
+                return df
+            df = load()
+            self.put(file_path, version, df)
+            return df
+
+    def stats(self) -> dict:
+        manifest = self._read_manifest()
+        entries = manifest["entries"].values()
+        return {
+            "directory": self.directory,
+            "entries": len(manifest["entries"]),
+            "bytes": sum(e["bytes"] for e in entries),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+        }
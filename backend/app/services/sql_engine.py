@@ -0,0 +1,351 @@
+import abc
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.services.schema import BOOLEAN, CATEGORY, DATETIME, NUMERIC, STRING, describe_schema
+from app.services.time_buckets import TIME_BUCKETS
+
+try:
+    import duckdb
+except ImportError: # optional dependency
+    duckdb = None
+
+# Embedded SQL Engine
+# QUERY_ENGINE=duckdb|sqlite runs datasource aggregations in an embedded SQL
+# engine instead of pandas. Local sources are queried straight from their
+# Parquet sidecar, remote ones from the cached frame. Query shapes the SQL
+# compiler does not cover return None and run in pandas as before.
+QUERY_ENGINE = os.getenv("QUERY_ENGINE", "pandas").lower() # pandas | duckdb | sqlite
+QUERY_ENGINE_THREADS = int(os.getenv("QUERY_ENGINE_THREADS", 0)) # 0 = all cores
+QUERY_ENGINE_MEMORY_LIMIT = os.getenv("QUERY_ENGINE_MEMORY_LIMIT", "") # e.g. "4GB"; DuckDB spills to disk above it
+SQLITE_BATCH_ROWS = 50_000
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _integer_kinds(kinds: Dict[str, str], integers: set) -> Dict[str, str]:
+    # NUMERIC is split so sums keep the integer/float type pandas would return
+    return {c: ("integer" if c in integers else k) for c, k in kinds.items()}
+
+
+def parquet_column_kinds(parquet_path: str) -> Dict[str, str]:
+    """
+    schema.py column kinds of a Parquet file, read from its footer only.
+    """
+    kinds = {}
+    for field in pq.read_schema(parquet_path):
+        t = field.type
+        if pa.types.is_dictionary(t):
+            kinds[field.name] = CATEGORY
+        elif pa.types.is_timestamp(t):
+            # Time zone handling differs between engines: leave it to pandas
+            kinds[field.name] = DATETIME if t.tz is None else STRING
+        elif pa.types.is_boolean(t):
+            kinds[field.name] = BOOLEAN
+        elif pa.types.is_integer(t):
+            kinds[field.name] = "integer"
+        elif pa.types.is_floating(t):
+            kinds[field.name] = NUMERIC
+        else:
+            kinds[field.name] = STRING
+    return kinds
+
+
+def frame_column_kinds(df: pd.DataFrame) -> Dict[str, str]:
+    kinds = describe_schema(df)
+    for column in df.columns:
+        dtype = df[column].dtype
+        if kinds[str(column)] == DATETIME and getattr(dtype, "tz", None) is not None:
+            kinds[str(column)] = STRING
+    integers = {str(c) for c in df.columns if kinds[str(c)] == NUMERIC and pd.api.types.is_integer_dtype(df[c])}
+    return _integer_kinds(kinds, integers)
+
+
+class SqlEngine(abc.ABC):
+    """
+    Compiles the datasource aggregation parameters to SQL and runs them.
+    Subclasses provide the dialect (bucket expressions, sums) and the way
+    a source is registered as a table.
+    """
+    name = "sql"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables: Dict[str, tuple] = {} # table name -> (version, column kinds)
+
+    def table_name(self, file_path: str) -> str:
+        return "ds_" + hashlib.sha1(file_path.encode("utf-8")).hexdigest()[:16]
+
+    # Dialect
+    @abc.abstractmethod
+    def bucket_expression(self, column: str, group_by: Optional[str]) -> str:
+        ...
+
+    @abc.abstractmethod
+    def sum_expression(self, column: str, kind: str) -> str:
+        ...
+
+    def date_bound(self, value: pd.Timestamp):
+        return value.to_pydatetime()
+
+    def table_reference(self, table: str) -> str:
+        return quote_identifier(table)
+
+    # Storage
+    @abc.abstractmethod
+    def register(self, table: str, version, parquet_path: Optional[str], df: Optional[pd.DataFrame]) -> Dict[str, str]:
+        ...
+
+    @abc.abstractmethod
+    def execute(self, table: str, sql: str, params: list) -> pd.DataFrame:
+        ...
+
+    def _table_kinds(self, file_path: str, version, parquet_path: Optional[str], df: Optional[pd.DataFrame]):
+        table = self.table_name(file_path)
+        with self._lock:
+            registered = self._tables.get(table)
+            if registered is None or registered[0] != version:
+                kinds = self.register(table, version, parquet_path, df)
+                self._tables[table] = (version, kinds)
+            return table, self._tables[table][1]
+
+    def aggregate(self,
+                  file_path: str,
+                  version,
+                  parquet_path: Optional[str] = None,
+                  df: Optional[pd.DataFrame] = None,
+                  start_date: Optional[str] = None,
+                  end_date: Optional[str] = None,
+                  date_column: Optional[str] = None,
+                  x_column: Optional[str] = None,
+                  y_column: Optional[str] = None,
+                  y_column_2: Optional[str] = None,
+                  breakdown_column: Optional[str] = None,
+                  filter_column: Optional[str] = None,
+                  filter_value: Optional[str] = None,
+                  group_by: Optional[str] = 'day',
+                  **_) -> Optional[pd.DataFrame]:
+        """
+        Grouped sums for a datasource query, the same frame the pandas
+        groupby in query_dataframe produces (before zero-filling and
+        sorting), or None when the query must run in pandas.
+        The source is `parquet_path` when given, else the frame `df`.
+        """
+        if version is None or (parquet_path is None and df is None):
+            return None
+        table, kinds = self._table_kinds(file_path, version, parquet_path, df)
+
+        if not (x_column and y_column and x_column in kinds and y_column in kinds):
+            return None # Raw rows: nothing to aggregate
+        y_cols = [y_column] + ([y_column_2] if y_column_2 and y_column_2 in kinds else [])
+        if breakdown_column not in kinds:
+            breakdown_column = None
+        group_cols = [x_column] + ([breakdown_column] if breakdown_column else [])
+        if len(set(y_cols)) != len(y_cols) or set(y_cols).intersection(group_cols) or x_column == breakdown_column:
+            return None
+        if any(kinds[y] not in (NUMERIC, "integer") for y in y_cols):
+            return None # pandas coerces text columns with to_numeric
+        if group_by in TIME_BUCKETS and kinds[x_column] != DATETIME:
+            return None # pandas parses text dates with to_datetime
+
+        where: List[str] = []
+        params: list = []
+        if date_column and (start_date or end_date) and date_column in kinds:
+            if kinds[date_column] != DATETIME:
+                return None
+            try:
+                start_dt = pd.to_datetime(start_date) if start_date else None
+                end_dt = pd.to_datetime(end_date) + pd.Timedelta(days=1) if end_date else None
+            except Exception:
+                return None # pandas ignores unparseable bounds
+            if start_dt is not None:
+                where.append(f"{quote_identifier(date_column)} >= ?")
+                params.append(self.date_bound(start_dt))
+            if end_dt is not None:
+                where.append(f"{quote_identifier(date_column)} < ?")
+                params.append(self.date_bound(end_dt))
+
+        if filter_column and filter_value and filter_column in kinds:
+            # pandas compares astype(str); only text columns compare the same way
+            if kinds[filter_column] not in (STRING, CATEGORY) or str(filter_value) == 'nan':
+                return None
+            where.append(f"{quote_identifier(filter_column)} = ?")
+            params.append(str(filter_value))
+
+        # groupby drops rows with a missing key
+        where.extend(f"{quote_identifier(c)} IS NOT NULL" for c in group_cols)
+
+        x_expr = self.bucket_expression(quote_identifier(x_column), group_by)
+        group_exprs = [x_expr] + [quote_identifier(c) for c in group_cols[1:]]
+        select = [f"{x_expr} AS {quote_identifier(x_column)}"]
+        select += [quote_identifier(c) for c in group_cols[1:]]
+        select += [f"{self.sum_expression(quote_identifier(y), kinds[y])} AS {quote_identifier(y)}" for y in y_cols]
+        positions = ", ".join(str(i + 1) for i in range(len(group_exprs)))
+        sql = (
+            f"SELECT {', '.join(select)} FROM {self.table_reference(table)}"
+            f" WHERE {' AND '.join(where)}"
+            f" GROUP BY {positions} ORDER BY {positions}"
+        )
+
+        result = self.execute(table, sql, params)
+        if kinds[x_column] == DATETIME and not pd.api.types.is_datetime64_any_dtype(result[x_column]):
+            result[x_column] = pd.to_datetime(result[x_column], format='ISO8601')
+        for column in group_cols:
+            # Zero-filling and sorting depend on the key dtype: restore categories
+            if kinds[column] == CATEGORY and not isinstance(result[column].dtype, pd.CategoricalDtype):
+                result[column] = result[column].astype("category")
+        return result
+
+
+class DuckDBEngine(SqlEngine):
+    """
+    DuckDB: multithreaded, reads Parquet sidecars in place and spills to
+    disk above QUERY_ENGINE_MEMORY_LIMIT, so sources larger than RAM work.
+    """
+    name = "duckdb"
+
+    def __init__(self, temp_directory: str):
+        super().__init__()
+        self._connection = duckdb.connect(":memory:")
+        if QUERY_ENGINE_THREADS:
+            self._connection.execute(f"SET threads = {QUERY_ENGINE_THREADS}")
+        if QUERY_ENGINE_MEMORY_LIMIT:
+            self._connection.execute(f"SET memory_limit = '{QUERY_ENGINE_MEMORY_LIMIT}'")
+        self._connection.execute(f"SET temp_directory = '{temp_directory}'")
+
+    def bucket_expression(self, column: str, group_by: Optional[str]) -> str:
+        unit = {'hour': 'hour', 'week': 'week', 'isoweek': 'week', 'month': 'month', 'quarter': 'quarter', 'year': 'year'}.get(group_by)
+        # date_trunc('week') starts on Monday, like the pandas buckets
+        return f"CAST(date_trunc('{unit}', {column}) AS TIMESTAMP)" if unit else column
+
+    def sum_expression(self, column: str, kind: str) -> str:
+        if kind == 'integer':
+            return f"CAST(COALESCE(SUM({column}), 0) AS BIGINT)"
+        # fsum is compensated (Kahan) like pandas sums, so float totals match
+        return f"CAST(COALESCE(fsum({column}), 0) AS DOUBLE)"
+
+    def register(self, table, version, parquet_path, df):
+        name = quote_identifier(table)
+        if parquet_path is not None:
+            literal = parquet_path.replace("'", "''")
+            self._connection.execute(f"CREATE OR REPLACE VIEW {name} AS SELECT * FROM read_parquet('{literal}')")
+            return parquet_column_kinds(parquet_path)
+        # Registered frames are only visible to this connection, not to the
+        # per-query cursors: copy the (remote, sheet-sized) frame into a table.
+        # A source is always remote or always local, so names never switch type.
+        self._connection.register("incoming_frame", df)
+        try:
+            self._connection.execute(f"CREATE OR REPLACE TABLE {name} AS SELECT * FROM incoming_frame")
+        finally:
+            self._connection.unregister("incoming_frame")
+        return frame_column_kinds(df)
+
+    def execute(self, table, sql, params):
+        # One cursor per query: cursors of a connection are safe across threads
+        cursor = self._connection.cursor()
+        try:
+            return cursor.execute(sql, params).df()
+        finally:
+            cursor.close()
+
+
+class SQLiteEngine(SqlEngine):
+    """
+    SQLite fallback (standard library). Each source version is copied once
+    into a database file under `directory`; queries open it read-only.
+    """
+    name = "sqlite"
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = directory
+        self._paths: Dict[str, str] = {}
+
+    def bucket_expression(self, column: str, group_by: Optional[str]) -> str:
+        # Datetimes are stored as 'YYYY-MM-DD HH:MM:SS[.ffffff]' text
+        if group_by == 'hour':
+            return f"strftime('%Y-%m-%d %H:00:00', {column})"
+        if group_by in ('week', 'isoweek'):
+            return f"date({column}, 'weekday 0', '-6 days')"
+        if group_by == 'month':
+            return f"strftime('%Y-%m-01', {column})"
+        if group_by == 'quarter':
+            return f"printf('%s-%02d-01', strftime('%Y', {column}), ((CAST(strftime('%m', {column}) AS INTEGER) - 1) / 3) * 3 + 1)"
+        if group_by == 'year':
+            return f"strftime('%Y-01-01', {column})"
+        return column
+
+    def sum_expression(self, column: str, kind: str) -> str:
+        return f"COALESCE(SUM({column}), 0)" if kind == 'integer' else f"TOTAL({column})"
+
+    def date_bound(self, value: pd.Timestamp):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+
+    def table_reference(self, table: str) -> str:
+        return "data" # one table per database file
+
+    def register(self, table, version, parquet_path, df):
+        os.makedirs(self.directory, exist_ok=True)
+        tag = hashlib.sha1(repr(version).encode("utf-8")).hexdigest()[:8]
+        db_path = os.path.join(self.directory, f"{table}.{tag}.db")
+        if parquet_path is not None:
+            kinds = parquet_column_kinds(parquet_path)
+        else:
+            kinds = frame_column_kinds(df)
+        if not os.path.exists(db_path):
+            # Unique per process and thread, so concurrent registrations of
+            # the same version do not write into one database file
+            tmp_path = f"{db_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with sqlite3.connect(tmp_path) as connection:
+                    if parquet_path is not None:
+                        # Copy row groups in batches instead of materializing the frame
+                        for batch in pq.ParquetFile(parquet_path).iter_batches(batch_size=SQLITE_BATCH_ROWS):
+                            batch.to_pandas().to_sql("data", connection, if_exists="append", index=False)
+                    else:
+                        df.to_sql("data", connection, index=False, chunksize=SQLITE_BATCH_ROWS)
+                connection.close()
+                os.replace(tmp_path, db_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        previous = self._paths.get(table)
+        self._paths[table] = db_path
+        if previous and previous != db_path and os.path.exists(previous):
+            os.remove(previous)
+        return kinds
+
+    def execute(self, table, sql, params):
+        db_path = self._paths[table]
+        connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            return pd.read_sql_query(sql, connection, params=params)
+        finally:
+            connection.close()
+
+
+def create_engine(kind: str, directory: str) -> Optional[SqlEngine]:
+    """
+    The configured SQL engine, or None to keep queries in pandas.
+    Falls back to SQLite when DuckDB is requested but not installed.
+    """
+    if kind == "duckdb":
+        if duckdb is not None:
+            os.makedirs(directory, exist_ok=True)
+            return DuckDBEngine(directory)
+        print("QUERY_ENGINE=duckdb but duckdb is not installed; using SQLite")
+        kind = "sqlite"
+    if kind == "sqlite":
+        return SQLiteEngine(directory)
+    if kind != "pandas":
+        print(f"Unknown QUERY_ENGINE '{kind}'; using pandas")
+    return None
@@ -0,0 +1,111 @@
+import io
+import json
+from typing import Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+from fastapi.encoders import jsonable_encoder
+
+from app.services.data_processing import json_values
+
+# Streaming Responses
+# Large result frames are encoded incrementally, STREAM_CHUNK_ROWS rows at a
+# time, so peak memory is one chunk of Python objects instead of the whole
+# record list plus the full JSON body.
+STREAM_CHUNK_ROWS = 5000
+
+# format= value -> media type of the body
+STREAM_FORMATS = {
+    "json": "application/json", # {columns, rows}, not streamed (cached body)
+    "ndjson": "application/x-ndjson", # one JSON object per row
+    "split": "application/json", # {columns, total_rows, offset, data: [[...], ...]}, streamed
+    "arrow": "application/vnd.apache.arrow.stream", # Arrow IPC stream
+}
+
+
+def negotiate_format(format: Optional[str], accept: Optional[str]) -> str:
+    """
+    Response format from the `format` query parameter, else from the Accept
+    header, else plain JSON. Raises ValueError for an unknown format.
+    """
+    if format:
+        if format not in STREAM_FORMATS:
+            raise ValueError(f"Unknown format '{format}'. Use one of: {', '.join(STREAM_FORMATS)}")
+        return format
+    for media_range in (accept or "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        if media_type == STREAM_FORMATS["ndjson"]:
+            return "ndjson"
+        if media_type == STREAM_FORMATS["arrow"]:
+            return "arrow"
+    return "json"
+
+
+def page(df: pd.DataFrame, offset: Optional[int] = None, limit: Optional[int] = None) -> pd.DataFrame:
+    """
+    Rows [offset, offset + limit) of a result frame (a view, no copy).
+    """
+    if not offset and limit is None:
+        return df
+    start = offset or 0
+    return df.iloc[start:] if limit is None else df.iloc[start:start + limit]
+
+
+def _chunks(df: pd.DataFrame) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), STREAM_CHUNK_ROWS):
+        yield df.iloc[start:start + STREAM_CHUNK_ROWS]
+
+
+def _dumps(value) -> str:
+    # Same separators/escaping as FastAPI's JSONResponse
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+def ndjson_chunks(df: pd.DataFrame) -> Iterator[bytes]:
+    for chunk in _chunks(df):
+        # Values are encoded like dataframe_payload rows (NaN -> null, ISO dates)
+        rows = jsonable_encoder(json_values(chunk).to_dict(orient="records"))
+        yield "".join(_dumps(row) + "\n" for row in rows).encode("utf-8")
+
+
+def split_chunks(df: pd.DataFrame, offset: Optional[int] = None, total_rows: Optional[int] = None) -> Iterator[bytes]:
+    header = {
+        "columns": [str(c) for c in df.columns],
+        "total_rows": len(df) if total_rows is None else total_rows,
+        "offset": offset or 0
+    }
+    yield (_dumps(header)[:-1] + ',"data":[').encode("utf-8")
+    separator = ""
+    for chunk in _chunks(df):
+        rows = jsonable_encoder(list(json_values(chunk).itertuples(index=False, name=None)))
+        yield (separator + ",".join(_dumps(row) for row in rows)).encode("utf-8")
+        separator = ","
+    yield b"]}"
+
+
+def arrow_chunks(df: pd.DataFrame) -> Iterator[bytes]:
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for chunk in _chunks(df):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            # Hand out what was written so far and reuse the buffer
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue() # schema only (empty frame) and the end-of-stream marker
+
+
+def stream_frame(df: pd.DataFrame, format: str, offset: Optional[int] = None,
+                 total_rows: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Body chunks of a result page `df` in a streaming `format` (ndjson,
+    split or arrow). `offset`/`total_rows` describe the page for `split`.
+    """
+    if format == "ndjson":
+        return ndjson_chunks(df)
+    if format == "split":
+        return split_chunks(df, offset, total_rows)
+    if format == "arrow":
+        return arrow_chunks(df)
+    raise ValueError(f"Format '{format}' is not streamed")
@@ -0,0 +1,43 @@
+from typing import Optional
+
+import pandas as pd
+
+# Time Buckets
+# group_by -> function mapping a datetime64 Series to the start of its bucket.
+# All are vectorized (no per-row Python). 'day' keeps X values as they are.
+TIME_BUCKETS = {
+    'hour': lambda s: s.dt.floor('h'),
+    'week': lambda s: s.dt.to_period('W').dt.start_time, # weeks start Monday
+    'isoweek': lambda s: s.dt.to_period('W').dt.start_time, # labelled YYYY-Www after zero-filling
+    'month': lambda s: s.dt.to_period('M').dt.start_time,
+    'quarter': lambda s: s.dt.to_period('Q').dt.start_time,
+    'year': lambda s: s.dt.to_period('Y').dt.start_time,
+}
+
+# date_range frequency of each group_by, used to zero-fill missing buckets
+ZERO_FILL_FREQ = {
+    'day': 'D',
+    'hour': 'h',
+    'week': 'W-MON',
+    'isoweek': 'W-MON',
+    'month': 'MS',
+    'quarter': 'QS',
+    'year': 'YS',
+}
+
+
+def bucket_dates(values: pd.Series, group_by: Optional[str]) -> pd.Series:
+    """
+    Maps datetimes to the start of their `group_by` bucket (NaT stays NaT).
+    """
+    bucket = TIME_BUCKETS.get(group_by)
+    return bucket(values) if bucket else values
+
+
+def isoweek_labels(values: pd.Series) -> pd.Series:
+    """
+    ISO 8601 week labels (e.g. '2024-W05') for datetimes.
+    """
+    iso = values.dt.isocalendar()
+    labels = iso["year"].astype(str) + "-W" + iso["week"].astype(str).str.zfill(2)
+    return labels.where(values.notna(), None)
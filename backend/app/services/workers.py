@@ -0,0 +1,159 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+
+from fastapi import HTTPException
+
+T = TypeVar("T")
+
+# Query Worker Pool
+# CPU-heavy request work (pandas queries, encoding, AI analysis code) runs
+# here instead of on the event loop or in the shared default threadpool.
+# Threads rather than processes: the cached frames, rollups and indexes live
+# in this process, and pandas/numpy/DuckDB release the GIL in their kernels.
+QUERY_WORKERS = int(os.getenv("QUERY_WORKERS", min(32, (os.cpu_count() or 1) + 4)))
+QUERY_QUEUE_LIMIT = int(os.getenv("QUERY_QUEUE_LIMIT", 64)) # running + waiting jobs before 503
+QUERY_USER_CONCURRENCY = int(os.getenv("QUERY_USER_CONCURRENCY", 4)) # jobs per user before 429
+QUERY_RETRY_AFTER_SECONDS = 1
+
+
+class WorkerPool:
+    """
+    Bounded thread pool with admission control.
+
+    - At most `queue_limit` jobs are admitted (running or waiting); further
+      requests are rejected with 503 instead of queueing without bound.
+    - A user holds at most `user_concurrency` admitted jobs (429 beyond),
+      so one user's dashboard refresh cannot fill the queue.
+    """
+
+    def __init__(self, name: str, workers: int, queue_limit: int, user_concurrency: int):
+        self.name = name
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.user_concurrency = user_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-worker")
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        self._per_user: Dict[str, int] = {}
+        self.completed = 0
+        self.failed = 0
+        self.rejected_busy = 0
+        self.rejected_user = 0
+        self.max_depth = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    def _admit(self, user: Optional[str]):
+        with self._lock:
+            if self._admitted >= self.queue_limit:
+                self.rejected_busy += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Server busy: too many {self.name} in progress. Please retry.",
+                    headers={"Retry-After": str(QUERY_RETRY_AFTER_SECONDS)}
+                )
+            if user is not None and self.user_concurrency and self._per_user.get(user, 0) >= self.user_concurrency:
+                self.rejected_user += 1
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many concurrent queries for this user. Please retry.",
+                    headers={"Retry-After": str(QUERY_RETRY_AFTER_SECONDS)}
+                )
+            self._admitted += 1
+            self.max_depth = max(self.max_depth, self._admitted)
+            if user is not None:
+                self._per_user[user] = self._per_user.get(user, 0) + 1
+
+    def _release(self, user: Optional[str]):
+        with self._lock:
+            self._admitted -= 1
+            if user is not None:
+                remaining = self._per_user.get(user, 0) - 1
+                if remaining > 0:
+                    self._per_user[user] = remaining
+                else:
+                    self._per_user.pop(user, None)
+
+    async def run(self, user: Optional[str], fn: Callable[[], T]) -> T:
+        """
+        Runs `fn()` on a worker thread for `user` and awaits its result.
+        Raises HTTPException (503/429) when the job is not admitted.
+        """
+        self._admit(user)
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            with self._lock:
+                self._running += 1
+                self._wait_seconds += started - submitted
+            try:
+                return fn()
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._run_seconds += time.perf_counter() - started
+
+        def done(future):
+            # Runs when the job finishes or is cancelled before starting, so
+            # admission is released even if the client went away meanwhile
+            with self._lock:
+                if future.cancelled() or future.exception() is not None:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+            self._release(user)
+
+        future = self._executor.submit(job)
+        future.add_done_callback(done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "user_concurrency": self.user_concurrency,
+                "admitted": self._admitted,
+                "running": self._running,
+                "queued": self._admitted - self._running,
+                "max_depth": self.max_depth,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected_busy": self.rejected_busy,
+                "rejected_user": self.rejected_user,
+                "avg_wait_ms": (self._wait_seconds / finished * 1000) if finished else None,
+                "avg_run_ms": (self._run_seconds / finished * 1000) if finished else None,
+                "users": dict(self._per_user),
+            }
+
+
+query_pool = WorkerPool(
+    "queries",
+    workers=QUERY_WORKERS,
+    queue_limit=QUERY_QUEUE_LIMIT,
+    user_concurrency=QUERY_USER_CONCURRENCY
+)
+
+# Password Hashing Pool
+# bcrypt burns ~100-300 ms of CPU per hash or check (it releases the GIL).
+# Logins, registrations and Google sign-ups hash here, at most
+# PASSWORD_WORKERS at a time, so a burst of logins neither blocks the event
+# loop nor takes every core from queries; beyond PASSWORD_QUEUE_LIMIT
+# waiting logins the server answers 503.
+PASSWORD_WORKERS = int(os.getenv("PASSWORD_WORKERS", max(1, min(4, (os.cpu_count() or 1) // 2))))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", 32))
+
+password_pool = WorkerPool(
+    "logins",
+    workers=PASSWORD_WORKERS,
+    queue_limit=PASSWORD_QUEUE_LIMIT,
+    user_concurrency=0
+)
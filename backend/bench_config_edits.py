@@ -0,0 +1,80 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+
+# Add current directory to path so we can import app
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.services.metadata_store import MetadataStore
+
+# Edit throughput of dashboard configs under concurrency.
+# Every worker adds charts to random sections of one shared config file the
+# way the dashboard-config router does (metadata store update()). At the end
+# the file must hold every chart: a lost update shows up as a missing chart.
+#
+#   python bench_config_edits.py --processes 4 --threads 8 --edits 200
+
+
+def _add_charts(args):
+    config_path, threads, edits, sections = args
+    store = MetadataStore(recheck_seconds=2)
+    latencies = []
+
+    def add_chart(i):
+        section_id = f"section-{i % sections}"
+        chart = {"id": str(uuid.uuid4()), "title": f"chart {i}", "datasource_id": "ds", "chart_type": "bar",
+                 "x_column": "Date", "y_column": "Revenue"}
+
+        def edit(config):
+            section = next(s for s in config if s["id"] == section_id)
+            section["charts"].append(chart)
+
+        started = time.perf_counter()
+        store.update(config_path, [], edit)
+        latencies.append(time.perf_counter() - started)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(add_chart, range(edits)))
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent dashboard config edit benchmark")
+    parser.add_argument("--processes", type=int, default=4, help="worker processes (like uvicorn workers)")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent requests per process")
+    parser.add_argument("--edits", type=int, default=200, help="charts added per process")
+    parser.add_argument("--sections", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        config_path = os.path.join(directory, "dashboard_config.json")
+        MetadataStore(recheck_seconds=2).save(
+            config_path,
+            [{"id": f"section-{i}", "title": f"Section {i}", "layout_columns": 2, "charts": []} for i in range(args.sections)]
+        )
+
+        started = time.perf_counter()
+        with Pool(args.processes) as pool:
+            results = pool.map(_add_charts, [(config_path, args.threads, args.edits, args.sections)] * args.processes)
+        elapsed = time.perf_counter() - started
+
+        config = MetadataStore(recheck_seconds=2).document(config_path, [])
+        stored = sum(len(s["charts"]) for s in config)
+
+    latencies = sorted(l for result in results for l in result)
+    expected = args.processes * args.edits
+    print(f"Processes: {args.processes}, threads: {args.threads}, edits: {expected}")
+    print(f"Throughput: {expected / elapsed:.0f} edits/s")
+    print(f"Latency p50: {statistics.median(latencies) * 1000:.2f} ms, "
+          f"p99: {latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms")
+    print(f"Charts stored: {stored}/{expected} ({expected - stored} lost)")
+
+
+if __name__ == "__main__":
+    main()
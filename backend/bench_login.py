@@ -0,0 +1,79 @@
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+
+# Login latency under load, next to dashboard data traffic.
+# Runs against a live server (uvicorn app.main:app). Login threads post to
+# /token while data threads fetch a datasource's /data; a login burst that
+# blocks the event loop shows up as high /data percentiles.
+#
+#   python bench_login.py --url http://localhost:8000 --datasource <id> --logins 16 --readers 8
+
+
+def _percentiles(samples):
+    if not samples:
+        return "no samples"
+    samples = sorted(samples)
+    p99 = samples[max(0, int(len(samples) * 0.99) - 1)]
+    return f"n={len(samples)} p50={statistics.median(samples) * 1000:.1f} ms p99={p99 * 1000:.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/token and /data latency under concurrent logins")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--datasource", help="datasource id for /data traffic (default: the user's first)")
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login threads")
+    parser.add_argument("--readers", type=int, default=8, help="concurrent /data threads")
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    args = parser.parse_args()
+
+    credentials = {"username": args.username, "password": args.password}
+    token = requests.post(f"{args.url}/token", data=credentials).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    datasource = args.datasource or requests.get(f"{args.url}/api/datasources/", headers=headers).json()[0]["id"]
+    data_url = f"{args.url}/api/datasources/{datasource}/data"
+
+    stop = time.perf_counter() + args.duration
+    lock = threading.Lock()
+    timings = {"token": [], "data": []}
+    statuses = {}
+
+    def run(name, call):
+        with requests.Session() as session:
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                try:
+                    status = call(session).status_code
+                except requests.RequestException:
+                    status = "error"
+                elapsed = time.perf_counter() - started
+                with lock:
+                    statuses[(name, status)] = statuses.get((name, status), 0) + 1
+                    if status == 200:
+                        timings[name].append(elapsed)
+
+    threads = [
+        threading.Thread(target=run, args=("token", lambda s: s.post(f"{args.url}/token", data=credentials)))
+        for _ in range(args.logins)
+    ] + [
+        threading.Thread(target=run, args=("data", lambda s: s.get(data_url, headers=headers)))
+        for _ in range(args.readers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"Logins: {args.logins} threads, data: {args.readers} threads, {args.duration:.0f} s")
+    print(f"/token {_percentiles(timings['token'])}")
+    print(f"/data  {_percentiles(timings['data'])}")
+    print("Status counts:", {f"{name} {status}": count for (name, status), count in sorted(statuses.items(), key=str)})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Import the backend as the server does (cwd = backend/)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def workdir(tmp_path_factory):
+    """
+    Runs the session in a scratch directory: datasources.json, users/,
+    uploads/ and cache/ are relative paths and the working tree's copies
+    are left alone.
+    """
+    path = tmp_path_factory.mktemp("backend")
+    previous = os.getcwd()
+    os.chdir(path)
+    os.makedirs("uploads")
+    yield path
+    os.chdir(previous)
+
+
+@pytest.fixture(scope="session")
+def client(workdir):
+    from fastapi.testclient import TestClient
+    from app.auth_utils import User, get_current_active_user
+    from app.main import app
+
+    app.dependency_overrides[get_current_active_user] = lambda: User(username="tester", disabled=False)
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def sales():
+    """
+    Two months of sales rows in random date order.
+    """
+    rng = np.random.default_rng(7)
+    rows = 600
+    return pd.DataFrame({
+        "Date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 60, rows), unit="D"),
+        "Product": rng.choice(["Keyboard", "Laptop", "Monitor", "Mouse"], rows),
+        "Branch": rng.choice(["North", "South"], rows),
+        "Revenue": rng.integers(10, 1000, rows),
+        "Units": rng.integers(1, 20, rows).astype(float),
+    })
+
+
+@pytest.fixture
+def add_datasource(client):
+    """
+    Writes a frame to uploads/<name>.csv, registers it as a datasource and
+    returns its id. Sources are cached by path: use a new name per frame.
+    """
+    def add(df: pd.DataFrame, name: str) -> str:
+        path = os.path.join("uploads", f"{name}.csv")
+        df.to_csv(path, index=False, date_format="%Y-%m-%d")
+        response = client.post("/api/datasources/", json={
+            "name": name, "type": "csv", "path": path, "columns": [str(c) for c in df.columns]
+        })
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+    return add
@@ -0,0 +1,162 @@
+import os
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import data_processing
+from app.services.date_index import build_date_index
+from app.services.rollups import build_rollups
+from app.services.schema import describe_schema, infer_schema
+
+HEADER = "Date,Region,Units,Price,Note,Flag\n"
+QUERIES = [
+    {"x_column": "Date", "y_column": "Units", "breakdown_column": "Region", "group_by": "week"},
+    {"x_column": "Date", "y_column": "Price", "group_by": "month",
+     "date_column": "Date", "start_date": "2024-01-10", "end_date": "2024-02-20"},
+]
+
+
+def _rows(rng, count, first_day, regions, times=False):
+    lines = []
+    for _ in range(count):
+        day = pd.Timestamp("2024-01-01") + pd.Timedelta(days=first_day + rng.randint(0, 30))
+        stamp = day.strftime("%Y-%m-%d") + (f" {rng.randint(0, 23):02d}:00" if times else "")
+        lines.append(f"{stamp},{rng.choice(regions)},{rng.randint(0, 99)},{rng.random() * 10:.3f},"
+                     f"note {rng.randint(0, 10**6)},{rng.choice(['True', 'False'])}\n")
+    return "".join(lines)
+
+
+@pytest.fixture
+def source(request):
+    """
+    Path of a CSV for this test and a write(text, mode) that gives every
+    change a later mtime (a new data version).
+    """
+    path = os.path.join("uploads", f"{request.node.name}.csv")
+
+    def write(text, mode="a"):
+        with open(path, mode) as f:
+            f.write(text)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    return path, write
+
+
+@pytest.fixture
+def appends(monkeypatch):
+    # Counts the loads that extended the sidecar instead of re-parsing
+    used = []
+    append_file = data_processing.append_file
+
+    def counting(*args, **kwargs):
+        result = append_file(*args, **kwargs)
+        used.append(result is not None)
+        return result
+    monkeypatch.setattr(data_processing, "append_file", counting)
+    return used
+
+
+def _assert_like_fresh_load(path):
+    """
+    Loads `path` as the server does (queries included, so the date index is
+    cached) and compares the frame, rollups and date index with ones built
+    from a full parse.
+    """
+    df, version = data_processing.get_versioned_data(path)
+    for params in QUERIES:
+        data_processing.run_query(path, df, version, params)
+    full, _ = infer_schema(data_processing._read_source(path))
+
+    assert describe_schema(df) == describe_schema(full)
+    pd.testing.assert_frame_equal(df, full, check_categorical=False, check_dtype=False)
+    assert list(df["Region"].cat.categories) == list(full["Region"].cat.categories)
+
+    rollups = data_processing.rollup_cache.peek(path)
+    expected = build_rollups(full)
+    assert rollups.version == version and set(rollups.value) == set(expected)
+    for key, rollup in expected.items():
+        pd.testing.assert_frame_equal(rollups.value[key].reset_index(drop=True), rollup.reset_index(drop=True),
+                                      check_dtype=False, check_categorical=False)
+
+    index = data_processing.date_index_cache.peek((path, "Date"))
+    if index is not None and index.version == version:
+        built = build_date_index(full, "Date")
+        assert index.value.monotonic == built.monotonic
+        assert np.array_equal(index.value.values, built.values.astype(index.value.values.dtype))
+        assert (index.value.positions is None) == (built.positions is None)
+        if built.positions is not None:
+            assert np.array_equal(index.value.positions, built.positions)
+    return df
+
+
+def test_appended_rows_extend_the_loaded_frame(source, appends):
+    path, write = source
+    rng = random.Random(1)
+    write(HEADER + _rows(rng, 2000, 0, ["north", "south", "east"]), "w")
+    _assert_like_fresh_load(path)
+
+    write(_rows(rng, 300, 31, ["north", "south", "east"]))
+    _assert_like_fresh_load(path)
+    # New categories and dates before the loaded ones
+    write(_rows(rng, 300, 10, ["west", "central", "north"]))
+    _assert_like_fresh_load(path)
+    write("\n\n")
+    assert len(_assert_like_fresh_load(path)) == 2600
+    assert appends and all(appends)
+
+
+def test_other_changes_reload_the_source(source, appends):
+    path, write = source
+    rng = random.Random(2)
+    write(HEADER + _rows(rng, 1000, 0, ["north", "south", "east"]), "w")
+    _assert_like_fresh_load(path)
+
+    # Earlier bytes rewritten
+    write(open(path).read().replace("north", "NORTH", 1), "w")
+    _assert_like_fresh_load(path)
+    # A value the loaded column type cannot hold
+    write("2024-03-01,north,notanumber,1.0,x,True\n")
+    _assert_like_fresh_load(path)
+    assert not any(appends)
+
+
+def test_row_completed_after_a_missing_line_break(source, appends):
+    path, write = source
+    rng = random.Random(3)
+    write(HEADER + _rows(rng, 500, 0, ["north", "south"]), "w")
+    _assert_like_fresh_load(path)
+
+    write("2024-03-02,north,5,1.0,x,True")
+    _assert_like_fresh_load(path)
+    # The sidecar ends mid-line: its last row is extended, not appended to
+    write("\n2024-03-03,north,6,2.0,y,False\n")
+    assert len(_assert_like_fresh_load(path)) == 502
+    assert appends[0] and not any(appends[1:])
+
+
+def test_appended_times_drop_the_day_rollups(source):
+    path, write = source
+    rng = random.Random(4)
+    write(HEADER + _rows(rng, 500, 0, ["north", "south"]), "w")
+    _assert_like_fresh_load(path)
+
+    write(_rows(rng, 50, 40, ["north"], times=True))
+    _assert_like_fresh_load(path)
+    rollups = data_processing.rollup_cache.peek(path).value
+    assert not any(date_column == "Date" for date_column, _ in rollups)
+
+
+def test_sidecar_extended_by_another_loader(source, appends):
+    path, write = source
+    rng = random.Random(5)
+    write(HEADER + _rows(rng, 1000, 0, ["north", "south"]), "w")
+    _assert_like_fresh_load(path)
+
+    # Another worker or an ingest job moves the sidecar past the cached version
+    write(_rows(rng, 200, 0, ["north", "south"]))
+    data_processing.ingest_file(path)
+    write(_rows(rng, 200, 0, ["north", "south"]))
+    assert len(_assert_like_fresh_load(path)) == 1400
+    assert appends and all(appends)
@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app import auth_utils
+from app.auth_utils import (
+    USERS_FILE, UserInDB, create_access_token, get_current_active_user, get_current_user, get_password_hash_async,
+    load_db, update_db, verify_password_async
+)
+from app.services.workers import WorkerPool
+
+
+def _register(client, username, password="secret"):
+    return client.post("/register", json={"username": username, "password": password})
+
+
+def test_registration_keeps_users_added_by_another_worker(client):
+    assert _register(client, "here").status_code == 200
+    # Another worker process signs a user up: this one's copy is not rechecked yet
+    users = json.loads(open(USERS_FILE).read())
+    users["elsewhere"] = {**users["here"], "username": "elsewhere"}
+    with open(USERS_FILE, "w") as f:
+        json.dump(users, f)
+
+    assert _register(client, "later").status_code == 200
+    assert {"here", "elsewhere", "later"} <= set(json.loads(open(USERS_FILE).read()))
+
+
+def test_taken_username_is_not_overwritten(client):
+    assert _register(client, "taken", "first").status_code == 200
+    hashed = load_db()["taken"]["hashed_password"]
+
+    response = _register(client, "taken", "second")
+    assert response.status_code == 400
+    assert load_db()["taken"]["hashed_password"] == hashed
+
+
+def _current_user(token):
+    async def resolve():
+        return await get_current_active_user(await get_current_user(token))
+    return asyncio.run(resolve())
+
+
+def _add_user(username, **fields):
+    user = UserInDB(username=username, hashed_password="unused", disabled=False, **fields)
+    update_db(lambda db: db.update({username: user.dict()}))
+
+
+def test_verified_tokens_are_cached(monkeypatch):
+    _add_user("cached")
+    token = create_access_token({"sub": "cached"}, timedelta(minutes=5))
+    decodes = []
+    decode = auth_utils.jwt.decode
+    monkeypatch.setattr(auth_utils.jwt, "decode", lambda *args, **kwargs: decodes.append(1) or decode(*args, **kwargs))
+
+    first, second = _current_user(token), _current_user(token)
+    assert first.username == "cached" and second is first
+    assert len(decodes) == 1
+    # Never cached past the token's expiry
+    entry = auth_utils.token_cache.peek(hashlib.sha256(token.encode("utf-8")).hexdigest())
+    assert entry.version <= time.time() + 5 * 60
+
+
+@pytest.mark.parametrize("token", [
+    "not-a-token",
+    create_access_token({"sub": "cached"}, timedelta(minutes=-1)),
+    create_access_token({"other": "claim"}),
+])
+def test_rejected_tokens_are_not_cached(token):
+    before = len(auth_utils.token_cache)
+    with pytest.raises(HTTPException) as error:
+        _current_user(token)
+    assert error.value.status_code == 401
+    assert len(auth_utils.token_cache) == before
+
+
+def test_changed_user_record_replaces_the_cached_user():
+    _add_user("changing", full_name="Before")
+    token = create_access_token({"sub": "changing"})
+    assert _current_user(token).full_name == "Before"
+
+    _add_user("changing", full_name="After")
+    assert _current_user(token).full_name == "After"
+    update_db(lambda db: db["changing"].update(disabled=True))
+    with pytest.raises(HTTPException) as error:
+        _current_user(token)
+    assert error.value.status_code == 400
+
+    update_db(lambda db: db.pop("changing"))
+    with pytest.raises(HTTPException) as error:
+        _current_user(token)
+    assert error.value.status_code == 404
+
+
+def test_passwords_are_hashed_on_the_login_pool(monkeypatch):
+    threads = []
+    hash = auth_utils.get_password_hash
+    monkeypatch.setattr(auth_utils, "get_password_hash",
+                        lambda password: threads.append(threading.current_thread().name) or hash(password))
+
+    hashed = asyncio.run(get_password_hash_async("secret"))
+    assert threads[0].startswith("logins-worker")
+    assert asyncio.run(verify_password_async("secret", hashed))
+    assert not asyncio.run(verify_password_async("wrong", hashed))
+
+
+def test_login_checks_the_password(client):
+    assert _register(client, "login", "right").status_code == 200
+    assert client.post("/token", data={"username": "login", "password": "right"}).json()["token_type"] == "bearer"
+    assert client.post("/token", data={"username": "login", "password": "wrong"}).status_code == 401
+
+
+def test_full_login_pool_answers_503(client, monkeypatch):
+    assert _register(client, "busy", "secret").status_code == 200
+    monkeypatch.setattr(auth_utils, "password_pool", WorkerPool("logins", workers=1, queue_limit=0, user_concurrency=0))
+    response = client.post("/token", data={"username": "busy", "password": "secret"})
+    assert response.status_code == 503
+    assert "logins" in response.json()["detail"] and response.headers["Retry-After"] == "1"
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import data_processing
+
+
+@pytest.fixture
+def stores():
+    # 12 stores whose revenue grows with their number
+    rng = np.random.default_rng(3)
+    rows = 400
+    store = rng.integers(1, 13, rows)
+    return pd.DataFrame({
+        "Date": pd.Timestamp("2024-03-01") + pd.to_timedelta(rng.integers(0, 20, rows), unit="D"),
+        "Store": [f"S{n:02d}" for n in store],
+        "Revenue": store * rng.integers(1, 10, rows),
+    })
+
+
+def _query(client, id, **params):
+    response = client.get(f"/api/datasources/{id}/data", params={
+        "x_column": "Date", "y_column": "Revenue", "group_by": "week", **params
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_capped_breakdown_marks_other_as_non_filterable(client, add_datasource, stores, monkeypatch):
+    id = add_datasource(stores, "cap_stores")
+    monkeypatch.setattr(data_processing, "BREAKDOWN_MAX_CATEGORIES", 5)
+
+    body = _query(client, id, breakdown_column="Store")
+    totals = stores.groupby("Store")["Revenue"].sum().sort_values(ascending=False)
+    series = {row["Store"] for row in body["rows"]}
+    assert series == set(totals.index[:5]) | {"Other"}
+    assert body["non_filterable"] == {"Store": ["Other"]}
+    assert sum(row["Revenue"] for row in body["rows"]) == totals.sum()
+
+
+def test_uncapped_breakdown_is_all_filterable(client, add_datasource, stores):
+    id = add_datasource(stores, "cap_stores_all")
+    body = _query(client, id, breakdown_column="Store")
+    assert len({row["Store"] for row in body["rows"]}) == 12
+    assert "non_filterable" not in body
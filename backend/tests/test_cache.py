@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+from app.services import data_processing
+from app.services.cache import BoundedCache, SingleFlight, dataframe_nbytes
+
+
+def _cache(max_bytes, **kwargs):
+    # Values are their own size
+    return BoundedCache("test", max_bytes=max_bytes, sizer=lambda value: value, **kwargs)
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = _cache(30)
+    for key in "abc":
+        cache.put(key, 10)
+    cache.get("a")
+    cache.put("d", 10)
+
+    assert [key for key in "abcd" if key in cache] == ["a", "c", "d"]
+    assert cache.stats()["bytes"] == 30 and cache.evictions == 1
+
+
+def test_lfu_evicts_the_least_used():
+    cache = _cache(30, policy="lfu")
+    for key in "abc":
+        cache.put(key, 10)
+    cache.get("a")
+    cache.get("a")
+    cache.get("b")
+    cache.put("d", 20)
+
+    assert [key for key in "abcd" if key in cache] == ["a", "d"]
+
+
+def test_owner_over_quota_evicts_its_own_entries():
+    cache = _cache(100, user_quota_bytes=30)
+    cache.put("alice-1", 20, owner="alice")
+    cache.put("bob-1", 20, owner="bob")
+    cache.put("alice-2", 20, owner="alice")
+
+    assert "alice-1" not in cache and "bob-1" in cache and "alice-2" in cache
+    assert cache.stats()["owners"] == {"alice": 20, "bob": 20}
+
+
+def test_values_over_the_budget_are_not_cached():
+    cache = _cache(100, user_quota_bytes=30)
+    cache.put("small", 10, owner="alice")
+    entry = cache.put("large", 40, owner="alice")
+
+    assert entry.value == 40 and "large" not in cache and "small" in cache
+    assert cache.rejected == 1
+
+
+def test_stale_entries_are_misses():
+    cache = _cache(100)
+    cache.put("a", 10, version=1)
+
+    assert cache.get("a", lambda entry: entry.version == 2) is None
+    assert cache.get("a", lambda entry: entry.version == 1).value == 10
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_dataframes_are_sized_with_their_strings():
+    short = pd.DataFrame({"text": ["a"] * 100})
+    long = pd.DataFrame({"text": ["a" * 1000] * 100})
+    assert dataframe_nbytes(long) > dataframe_nbytes(short) + 90_000
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait()
+        return object()
+
+    with ThreadPoolExecutor(4) as pool:
+        leader = pool.submit(flight.do, "key", load)
+        started.wait()
+        followers = [pool.submit(flight.do, "key", load) for _ in range(3)]
+        while flight.shared < 3:
+            time.sleep(0.001)
+        release.set()
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert len(calls) == 1 and all(result is results[0] for result in results)
+    # Completed keys are forgotten: the next call runs again
+    assert flight.do("key", lambda: "again") == "again"
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_followers_get_the_leaders_error():
+    flight = SingleFlight("test")
+    started, release = threading.Event(), threading.Event()
+
+    def fail():
+        started.set()
+        release.wait()
+        raise ValueError("broken source")
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, "key", fail)
+        started.wait()
+        follower = pool.submit(flight.do, "key", fail)
+        while not flight.shared:
+            time.sleep(0.001)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(ValueError, match="broken source"):
+                future.result()
+    assert flight.executions == 1
+
+
+def test_concurrent_cold_loads_parse_the_source_once(sales, monkeypatch):
+    path = os.path.join("uploads", "single_flight.csv")
+    sales.to_csv(path, index=False, date_format="%Y-%m-%d")
+    parses = []
+    ingest_file = data_processing.ingest_file
+
+    def slow_ingest(*args, **kwargs):
+        parses.append(1)
+        time.sleep(0.2) # every caller arrives while the first one loads
+        return ingest_file(*args, **kwargs)
+    monkeypatch.setattr(data_processing, "ingest_file", slow_ingest)
+
+    with ThreadPoolExecutor(6) as pool:
+        frames = list(pool.map(lambda _: data_processing.get_full_data(path), range(6)))
+    assert len(parses) == 1
+    assert all(df is frames[0] for df in frames) and len(frames[0]) == len(sales)
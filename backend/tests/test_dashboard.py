@@ -0,0 +1,69 @@
+import pytest
+
+RANGE = {"start_date": "2024-01-10", "end_date": "2024-02-20", "group_by": "week"}
+
+
+@pytest.fixture
+def section(client, add_datasource, sales, request):
+    """
+    A section with a chart with both breakdowns, a plain chart on the same
+    datasource and a chart whose datasource is gone.
+    """
+    id = add_datasource(sales, f"dashboard_{request.node.name}")
+    section = client.post("/api/dashboard-config/sections", json={"title": "Sales"}).json()
+
+    def add_chart(**fields):
+        response = client.post(f"/api/dashboard-config/sections/{section['id']}/charts", json={
+            "title": "chart", "datasource_id": id, "chart_type": "bar", "x_column": "Date", "y_column": "Revenue",
+            **fields
+        })
+        assert response.status_code == 200, response.text
+        return response.json()
+    charts = [
+        add_chart(y_column_2="Units", breakdown_x_column="Branch", breakdown_x_column_2="Product"),
+        add_chart(y_column="Units"),
+        add_chart(datasource_id="missing"),
+    ]
+    return id, section["id"], charts
+
+
+def _series(client, id, chart, breakdown=None, **params):
+    response = client.get(f"/api/datasources/{id}/data", params={
+        "x_column": chart["x_column"], "y_column": chart["y_column"], "sort_by": chart["x_column"],
+        "date_column": chart["x_column"], **RANGE, **({"breakdown_column": breakdown} if breakdown else {}), **params
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_section_data_matches_the_per_chart_queries(client, section):
+    id, section_id, (full, plain, orphan) = section
+    response = client.post(f"/api/dashboard/sections/{section_id}/data",
+                           json={**RANGE, "breakdown_filters": {full["id"]: "North"}})
+    assert response.status_code == 200, response.text
+    charts = response.json()["charts"]
+
+    assert charts[full["id"]] == {
+        "main": _series(client, id, full, y_column_2="Units"),
+        "breakdown": _series(client, id, full, breakdown="Branch"),
+        "breakdown_2": _series(client, id, full, breakdown="Product", filter_column="Branch", filter_value="North"),
+    }
+    assert charts[plain["id"]] == {"main": _series(client, id, plain)}
+    assert charts[orphan["id"]] == {"error": "Datasource not found"}
+
+
+def test_unchanged_section_is_not_modified(client, section):
+    id, section_id, charts = section
+    # Without the failing chart the section gets an ETag
+    client.delete(f"/api/dashboard-config/sections/{section_id}/charts/{charts[2]['id']}")
+    first = client.post(f"/api/dashboard/sections/{section_id}/data", json=RANGE)
+    etag = first.headers["ETag"]
+
+    again = client.post(f"/api/dashboard/sections/{section_id}/data", json=RANGE, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    other = client.post(f"/api/dashboard/sections/{section_id}/data", json=dict(RANGE, group_by="month"))
+    assert other.status_code == 200 and other.headers["ETag"] != etag
+
+
+def test_unknown_section(client):
+    assert client.post("/api/dashboard/sections/missing/data", json={}).status_code == 404
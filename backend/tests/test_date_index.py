@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.date_index import build_date_index
+
+BOUNDS = [
+    (None, None),
+    ("2024-01-10", "2024-01-20"),
+    ("2024-01-10", None),
+    (None, "2024-01-01"),
+    ("2024-03-01", "2024-04-01"),
+    ("2024-01-20", "2024-01-10"),
+]
+
+
+def _dates(rng, count, missing=0.0):
+    dates = pd.Series(pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 60 * 24, count), unit="h"))
+    return dates.mask(rng.random(count) < missing)
+
+
+def _expected(dates, start, end):
+    mask = dates.notna()
+    if start:
+        mask &= dates >= pd.Timestamp(start)
+    if end:
+        mask &= dates < pd.Timestamp(end)
+    return np.flatnonzero(mask.to_numpy())
+
+
+def _rows(index, count, start, end):
+    rows = index.rows_between(pd.Timestamp(start) if start else None, pd.Timestamp(end) if end else None)
+    return np.arange(count)[rows]
+
+
+@pytest.mark.parametrize("start, end", BOUNDS)
+@pytest.mark.parametrize("order", ["shuffled", "sorted", "missing"])
+def test_rows_between_match_a_mask(start, end, order):
+    rng = np.random.default_rng(11)
+    dates = _dates(rng, 1000, missing=0.1 if order == "missing" else 0.0)
+    if order == "sorted":
+        dates = dates.sort_values(ignore_index=True)
+    index = build_date_index(pd.DataFrame({"Date": dates}), "Date")
+
+    assert index.monotonic == (order == "sorted")
+    assert np.array_equal(_rows(index, len(dates), start, end), _expected(dates, start, end))
+
+
+@pytest.mark.parametrize("later", [False, True])
+def test_extended_index_matches_a_rebuilt_one(later):
+    rng = np.random.default_rng(12)
+    loaded = _dates(rng, 800).sort_values(ignore_index=True)
+    appended = _dates(rng, 200, missing=0.0 if later else 0.1)
+    if later:
+        # Sorted and after the loaded rows: stays a slice
+        appended = (appended + pd.Timedelta(days=60)).sort_values(ignore_index=True)
+    dates = pd.concat([loaded, appended], ignore_index=True)
+
+    extended = build_date_index(pd.DataFrame({"Date": loaded}), "Date").extended(appended, len(loaded))
+    assert extended.monotonic == later
+    for start, end in BOUNDS + [("2024-02-20", "2024-03-20")]:
+        assert np.array_equal(_rows(extended, len(dates), start, end), _expected(dates, start, end))
+
+
+def test_only_naive_datetime_columns_are_indexed():
+    df = pd.DataFrame({
+        "Text": ["2024-01-01", "2024-01-02"],
+        "Aware": pd.to_datetime(["2024-01-01", "2024-01-02"]).tz_localize("UTC"),
+    })
+    assert build_date_index(df, "Text") is None
+    assert build_date_index(df, "Aware") is None
+    assert build_date_index(df, "Missing") is None
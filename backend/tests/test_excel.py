@@ -0,0 +1,95 @@
+import os
+
+import pandas as pd
+import pytest
+
+from app.services import data_processing
+from app.services.data_processing import excel_source, split_source
+
+QUERY = {"x_column": "Branch", "y_column": "Revenue", "group_by": None, "sort_by": "Branch"}
+
+
+@pytest.fixture
+def workbook(client, sales, request):
+    """
+    A workbook with a summary sheet first and the sales rows on a second
+    sheet, registered as a datasource of that sheet; returns (path, record).
+    """
+    path = os.path.join("uploads", f"{request.node.name}.xlsx")
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"Note": ["summary"]}).to_excel(writer, sheet_name="Summary", index=False)
+        sales.to_excel(writer, sheet_name="Sales", index=False)
+    response = client.post("/api/datasources/", json={
+        "name": request.node.name, "type": "excel", "path": path, "columns": [], "sheet_name": "Sales"
+    })
+    assert response.status_code == 200, response.text
+    return path, response.json()
+
+
+def _rows(client, id, params):
+    response = client.get(f"/api/datasources/{id}/data", params=params)
+    assert response.status_code == 200, response.text
+    return response.json()["rows"]
+
+
+def _load_options(client, id, **options):
+    return client.put(f"/api/datasources/{id}/load-options", json=options)
+
+
+def test_source_keys():
+    assert excel_source("book.xlsx") == "book.xlsx"
+    key = excel_source("book.xlsx", "Sales", ["Revenue", "Date"])
+    assert split_source(key) == ("book.xlsx", {"sheet": "Sales", "columns": ["Date", "Revenue"]})
+    # Column order does not make another source
+    assert excel_source("book.xlsx", "Sales", ["Date", "Revenue"]) == key
+    assert split_source("data.csv::{}") == ("data.csv::{}", {})
+
+
+def test_datasource_reads_its_sheet(client, sales, workbook):
+    _, ds = workbook
+    assert ds["columns"] == list(sales.columns)
+    assert ds["column_types"]["Date"] == "datetime"
+    expected = sales.groupby("Branch")["Revenue"].sum()
+    assert [(row["Branch"], row["Revenue"]) for row in _rows(client, ds["id"], QUERY)] == list(expected.items())
+
+
+def test_queries_within_the_projection_read_only_its_columns(client, sales, workbook):
+    path, ds = workbook
+    response = _load_options(client, ds["id"], sheet_name="Sales", load_columns=["Branch", "Revenue"])
+    assert response.status_code == 200, response.text
+    assert response.json()["load_columns"] == ["Branch", "Revenue"]
+
+    expected = _rows(client, ds["id"], QUERY)
+    # Loaded (or ingested, with an SQL engine) as a source of its own
+    parquet_path, _ = data_processing._sidecar_paths(excel_source(path, "Sales", ["Branch", "Revenue"]))
+    assert list(pd.read_parquet(parquet_path).columns) == ["Branch", "Revenue"]
+    # Other columns are read from the whole sheet
+    by_product = _rows(client, ds["id"], dict(QUERY, x_column="Product", sort_by="Product"))
+    assert [(row["Product"], row["Revenue"]) for row in by_product] == \
+        list(sales.groupby("Product")["Revenue"].sum().items())
+    assert _rows(client, ds["id"], QUERY) == expected
+
+
+def test_projection_to_the_chart_columns(client, workbook):
+    _, ds = workbook
+    section = client.post("/api/dashboard-config/sections", json={"title": "Excel"}).json()
+    client.post(f"/api/dashboard-config/sections/{section['id']}/charts", json={
+        "title": "chart", "datasource_id": ds["id"], "chart_type": "bar",
+        "x_column": "Date", "y_column": "Units", "breakdown_x_column": "Branch"
+    })
+
+    response = _load_options(client, ds["id"], sheet_name="Sales", chart_columns=True)
+    assert response.status_code == 200, response.text
+    assert response.json()["load_columns"] == ["Date", "Units", "Branch"]
+
+
+def test_invalid_load_options(client, workbook, add_datasource, sales):
+    _, ds = workbook
+    assert _load_options(client, ds["id"], sheet_name="Sales", load_columns=["Missing"]).status_code == 400
+    assert _load_options(client, ds["id"], sheet_name="Missing").status_code == 400
+    assert _load_options(client, "missing", sheet_name="Sales").status_code == 404
+    csv = add_datasource(sales, "excel_options_csv")
+    assert _load_options(client, csv, load_columns=["Revenue"]).status_code == 400
+    # A rejected change leaves the datasource as it was
+    record = next(d for d in client.get("/api/datasources/").json() if d["id"] == ds["id"])
+    assert (record["sheet_name"], record["load_columns"]) == ("Sales", None)
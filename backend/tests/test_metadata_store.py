@@ -0,0 +1,96 @@
+import json
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from app.services.metadata_store import MetadataStore
+
+
+def _append_records(path, worker, count):
+    # A worker process with its own store
+    store = MetadataStore(recheck_seconds=60)
+    for i in range(count):
+        store.update(path, [], lambda records: records.append({"id": f"{worker}-{i}"}))
+
+
+def _ids(path):
+    with open(path) as f:
+        return {record["id"] for record in json.load(f)}
+
+
+def test_concurrent_edits_from_threads_are_kept(tmp_path):
+    path = str(tmp_path / "records.json")
+    store = MetadataStore(recheck_seconds=60)
+
+    def edit(worker):
+        for i in range(25):
+            store.update(path, [], lambda records: records.append({"id": f"{worker}-{i}"}))
+    threads = [threading.Thread(target=edit, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert _ids(path) == {f"{worker}-{i}" for worker in range(4) for i in range(25)}
+    assert store.find(path, "3-24", []) == {"id": "3-24"}
+
+
+def test_concurrent_edits_from_worker_processes_are_kept(tmp_path):
+    path = str(tmp_path / "records.json")
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_append_records, args=(path, worker, 20)) for worker in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert [worker.exitcode for worker in workers] == [0, 0, 0]
+    assert _ids(path) == {f"{worker}-{i}" for worker in range(3) for i in range(20)}
+
+
+def test_failed_edits_leave_the_file_alone(tmp_path):
+    path = str(tmp_path / "records.json")
+    store = MetadataStore(recheck_seconds=60)
+    store.update(path, [], lambda records: records.append({"id": "kept"}))
+
+    def fail(records):
+        records.append({"id": "dropped"})
+        raise ValueError("rejected")
+    with pytest.raises(ValueError):
+        store.update(path, [], fail)
+    # Not serializable: fails while writing the temp file
+    with pytest.raises(TypeError):
+        store.update(path, [], lambda records: records.append({"id": "broken", "value": object()}))
+
+    assert _ids(path) == {"kept"}
+    # No temp file left behind
+    assert sorted(os.listdir(tmp_path)) == ["records.json", "records.json.lock"]
+
+
+def test_other_writers_are_seen_after_the_recheck(tmp_path):
+    path = str(tmp_path / "users.json")
+    with open(path, "w") as f:
+        json.dump({"alice": {"id": 1}}, f)
+    cached = MetadataStore(recheck_seconds=60)
+    rechecked = MetadataStore(recheck_seconds=0)
+    for store in (cached, rechecked):
+        assert store.document(path, {}) == {"alice": {"id": 1}}
+
+    with open(path, "w") as f:
+        json.dump({"alice": {"id": 1}, "bob": {"id": 2}}, f)
+    assert cached.find(path, "bob", {}) is None
+    assert rechecked.find(path, "bob", {}) == {"id": 2}
+    assert (cached.reads, cached.hits) == (1, 1)
+
+
+def test_invalid_json_is_moved_aside(tmp_path):
+    path = str(tmp_path / "records.json")
+    with open(path, "w") as f:
+        f.write('[{"id": ')
+    store = MetadataStore(recheck_seconds=60)
+
+    assert store.document(path, []) == []
+    assert not os.path.exists(path)
+    assert [name for name in os.listdir(tmp_path) if name.startswith("records.json.corrupt-")]
@@ -0,0 +1,58 @@
+import pytest
+
+from app.services import data_processing
+
+QUERIES = [
+    {"x_column": "Date", "y_column": "Revenue", "group_by": "day"},
+    {"x_column": "Date", "y_column": "Revenue", "y_column_2": "Units", "group_by": "week"},
+    {"x_column": "Date", "y_column": "Revenue", "breakdown_column": "Product", "group_by": "month"},
+    {"x_column": "Date", "y_column": "Units", "filter_column": "Branch", "filter_value": "North",
+     "date_column": "Date", "start_date": "2024-01-10", "end_date": "2024-02-05"},
+    {"x_column": "Product", "y_column": "Revenue", "group_by": None, "sort_by": "Product"},
+]
+
+
+@pytest.fixture
+def out_of_core(monkeypatch):
+    # Every local CSV counts as too large to load
+    monkeypatch.setattr(data_processing, "OUT_OF_CORE_MIN_BYTES", 1)
+
+
+def _rows(client, id, params):
+    response = client.get(f"/api/datasources/{id}/data", params={k: v for k, v in params.items() if v is not None})
+    assert response.status_code == 200, response.text
+    return response.json()["rows"]
+
+
+def test_chunked_aggregates_match_the_loaded_frame(client, add_datasource, sales, monkeypatch):
+    loaded = add_datasource(sales, "ooc_loaded")
+    chunked = add_datasource(sales, "ooc_chunked")
+    expected = [_rows(client, loaded, params) for params in QUERIES]
+
+    monkeypatch.setattr(data_processing, "OUT_OF_CORE_MIN_BYTES", 1)
+    monkeypatch.setattr(data_processing, "OUT_OF_CORE_CHUNK_ROWS", 128)
+    assert [_rows(client, chunked, params) for params in QUERIES] == expected
+
+
+def test_raw_rows_of_an_out_of_core_csv_are_a_client_error(client, add_datasource, sales, out_of_core):
+    id = add_datasource(sales, "ooc_raw")
+    response = client.get(f"/api/datasources/{id}/data")
+    assert response.status_code == 400
+    assert "query it with an X and a Y column" in response.json()["detail"]
+
+
+@pytest.mark.parametrize("column, value", [("Date", "unknown"), ("Revenue", None), ("Units", "unknown")])
+def test_later_chunk_that_contradicts_the_first_one(client, add_datasource, sales, monkeypatch, column, value):
+    # A full load types the column as text (or float): so must the chunks after the first
+    sales = sales.astype({column: object})
+    sales.loc[500, column] = value
+    queries = [params for params in QUERIES if value is None or column not in (params["y_column"], params.get("y_column_2"))]
+    queries.append({"x_column": column, "y_column": "Revenue" if column != "Revenue" else "Units",
+                    "group_by": None, "sort_by": column})
+    loaded = add_datasource(sales, f"ooc_loaded_{column}")
+    chunked = add_datasource(sales, f"ooc_chunked_{column}")
+    expected = [_rows(client, loaded, params) for params in queries]
+
+    monkeypatch.setattr(data_processing, "OUT_OF_CORE_MIN_BYTES", 1)
+    monkeypatch.setattr(data_processing, "OUT_OF_CORE_CHUNK_ROWS", 128)
+    assert [_rows(client, chunked, params) for params in queries] == expected
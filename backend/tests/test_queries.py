@@ -0,0 +1,93 @@
+import pandas as pd
+import pytest
+
+# group_by -> (period of the bucket, date_range frequency of the buckets)
+BUCKETS = {
+    "day": ("D", "D"),
+    "week": ("W-SUN", "W-MON"),
+    "month": ("M", "MS"),
+    "quarter": ("Q", "QS"),
+    "year": ("Y", "YS"),
+}
+
+
+def _expected(df, group_by, y_column="Revenue", breakdown=None, filter=None, start=None, end=None):
+    """
+    Zero-filled sums of the raw rows per bucket (and breakdown value),
+    keyed like _result: {(ISO bucket start, breakdown value): sum}.
+    """
+    if filter:
+        df = df[df[filter[0]] == filter[1]]
+    if start:
+        df = df[(df["Date"] >= start) & (df["Date"] < pd.Timestamp(end) + pd.Timedelta(days=1))]
+        bounds = pd.Series(pd.to_datetime([start, end]))
+    else:
+        bounds = pd.Series([df["Date"].min(), df["Date"].max()])
+    period, freq = BUCKETS[group_by]
+    first, last = bounds.dt.to_period(period).dt.start_time
+    buckets = pd.date_range(first, last, freq=freq)
+    sums = df.groupby([df["Date"].dt.to_period(period).dt.start_time] + ([df[breakdown]] if breakdown else []))[y_column].sum()
+    values = sorted(df[breakdown].unique()) if breakdown else [None]
+    grid = pd.MultiIndex.from_product([buckets, values]) if breakdown else buckets
+    return {
+        (ts.isoformat(), value): total
+        for (ts, value), total in zip(
+            grid if breakdown else [(ts, None) for ts in grid], sums.reindex(grid, fill_value=0)
+        )
+    }
+
+
+def _result(client, id, y_column="Revenue", breakdown=None, **params):
+    response = client.get(f"/api/datasources/{id}/data", params={
+        "x_column": "Date", "y_column": y_column, "sort_by": "Date",
+        **({"breakdown_column": breakdown} if breakdown else {}), **params
+    })
+    assert response.status_code == 200, response.text
+    return {(row["Date"], row.get(breakdown)): row[y_column] for row in response.json()["rows"]}
+
+
+@pytest.fixture
+def sales_id(add_datasource, sales, request):
+    return add_datasource(sales, f"queries_{request.node.name}".replace("[", "_").replace("]", ""))
+
+
+@pytest.mark.parametrize("group_by", list(BUCKETS))
+def test_time_buckets_match_raw_sums(client, sales, sales_id, group_by):
+    assert _result(client, sales_id, group_by=group_by) == _expected(sales, group_by)
+
+
+@pytest.mark.parametrize("group_by", ["day", "week", "month"])
+def test_breakdowns_match_raw_sums(client, sales, sales_id, group_by):
+    assert _result(client, sales_id, breakdown="Product", group_by=group_by) == \
+        _expected(sales, group_by, breakdown="Product")
+
+
+def test_filtered_date_range_matches_raw_sums(client, sales, sales_id):
+    result = _result(client, sales_id, y_column="Units", group_by="week", filter_column="Branch", filter_value="North",
+                     date_column="Date", start_date="2024-01-10", end_date="2024-02-05")
+    assert result == _expected(sales, "week", y_column="Units", filter=("Branch", "North"),
+                               start="2024-01-10", end="2024-02-05")
+
+
+def test_breakdown_with_filter_on_another_column(client, sales, sales_id):
+    # Two dimensions: not covered by a rollup, runs over the raw rows
+    result = _result(client, sales_id, breakdown="Product", group_by="month", filter_column="Branch", filter_value="South")
+    assert result == _expected(sales, "month", breakdown="Product", filter=("Branch", "South"))
+
+
+def test_isoweek_labels(client, sales, sales_id):
+    result = _result(client, sales_id, group_by="isoweek")
+    weeks = _expected(sales, "week")
+    assert list(result.values()) == list(weeks.values())
+    assert [date for date, _ in result] == [
+        f"{iso.year}-W{iso.week:02d}" for iso in (pd.Timestamp(ts).isocalendar() for ts, _ in weeks)
+    ]
+
+
+def test_category_x_column(client, sales, sales_id):
+    response = client.get(f"/api/datasources/{sales_id}/data", params={
+        "x_column": "Product", "y_column": "Revenue", "sort_by": "Product"
+    })
+    rows = response.json()["rows"]
+    assert [(row["Product"], row["Revenue"]) for row in rows] == \
+        list(sales.groupby("Product")["Revenue"].sum().items())
@@ -0,0 +1,49 @@
+import os
+
+from app.services.query_cache import etag_matches
+
+PARAMS = {"x_column": "Date", "y_column": "Revenue", "group_by": "week"}
+
+
+def _touch(path):
+    # A later mtime is a new data version
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+
+def test_unchanged_result_is_not_modified(client, add_datasource, sales):
+    id = add_datasource(sales, "etag_unchanged")
+    url = f"/api/datasources/{id}/data"
+    first = client.get(url, params=PARAMS)
+    etag = first.headers["ETag"]
+
+    again = client.get(url, params=PARAMS, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert again.content == b""
+
+    other = client.get(url, params={**PARAMS, "group_by": "month"}, headers={"If-None-Match": etag})
+    assert other.status_code == 200
+    assert other.headers["ETag"] != etag
+
+
+def test_changed_source_gets_a_new_etag(client, add_datasource, sales):
+    id = add_datasource(sales, "etag_changed")
+    url = f"/api/datasources/{id}/data"
+    etag = client.get(url, params=PARAMS).headers["ETag"]
+
+    path = os.path.join("uploads", "etag_changed.csv")
+    sales.assign(Revenue=sales["Revenue"] * 2).to_csv(path, index=False, date_format="%Y-%m-%d")
+    _touch(path)
+    response = client.get(url, params=PARAMS, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert sum(row["Revenue"] for row in response.json()["rows"]) == 2 * sales["Revenue"].sum()
+
+
+def test_etag_matching():
+    assert etag_matches('"a", "b"', '"b"')
+    assert etag_matches('W/"b"', '"b"')
+    assert etag_matches("*", '"b"')
+    assert not etag_matches('"a"', '"b"')
+    assert not etag_matches('"b"', None)
@@ -0,0 +1,104 @@
+import threading
+
+import pytest
+import requests
+
+from app.services import data_processing
+
+
+class FakeResponse:
+    """
+    Streamed response serving `body` in chunks; with `gate` it stops after
+    the first `open_bytes` bytes until the gate is set.
+    """
+
+    def __init__(self, body: bytes, status_code=200, gate=None, open_bytes=0):
+        self.body = body
+        self.status_code = status_code
+        self.headers = {"ETag": '"v1"'}
+        self.gate = gate
+        self.open_bytes = open_bytes
+        self.served = 0
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+    def iter_content(self, chunk_size):
+        while self.served < len(self.body):
+            if self.gate is not None and self.served >= self.open_bytes:
+                self.gate.wait(10)
+            chunk = self.body[self.served:self.served + chunk_size]
+            self.served += len(chunk)
+            yield chunk
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def remote(monkeypatch):
+    """
+    Serves the next requests.get from a FakeResponse; returns the list of
+    requested URLs and a setter for the response.
+    """
+    requested = []
+    served = {}
+
+    def get(url, **kwargs):
+        requested.append(url)
+        return served["response"]
+    monkeypatch.setattr(data_processing.requests, "get", get)
+    monkeypatch.setattr(data_processing, "PREVIEW_SCHEMA_ROWS", 50)
+    monkeypatch.setattr(data_processing, "REMOTE_CHUNK_BYTES", 256)
+    return requested, lambda response: served.update(response=response)
+
+
+def _preview(client, url):
+    return client.post("/api/datasources/preview-url", json={"url": url})
+
+
+def _csv(sales):
+    return sales.to_csv(index=False, date_format="%Y-%m-%d").encode()
+
+
+def test_preview_does_not_wait_for_the_whole_body(client, sales, remote):
+    requested, serve = remote
+    url = "http://example.com/large.csv"
+    body, gate = _csv(sales), threading.Event()
+    response = FakeResponse(body, gate=gate, open_bytes=len(body) // 4)
+    serve(response)
+
+    preview = _preview(client, url).json()["preview"]
+    assert preview["total_rows"] is None
+    assert preview["columns"] == list(sales.columns)
+    assert preview["column_types"]["Date"] == "datetime" and preview["column_types"]["Revenue"] == "numeric"
+    assert response.served < len(body)
+
+    # The download goes on in the background; a load joins it
+    gate.set()
+    df = data_processing.get_full_data(url)
+    assert len(df) == len(sales) and response.served == len(body)
+    assert requested == [url]
+
+
+def test_small_body_is_cached_by_the_preview(client, sales, remote):
+    requested, serve = remote
+    url = "http://example.com/small.csv"
+    serve(FakeResponse(_csv(sales.head(20))))
+
+    preview = _preview(client, url).json()["preview"]
+    assert preview["total_rows"] == 20
+    assert len(data_processing.get_full_data(url)) == 20
+    assert requested == [url]
+
+
+def test_failed_download_is_a_client_error(client, remote):
+    _, serve = remote
+    serve(FakeResponse(b"", status_code=404))
+    response = _preview(client, "http://example.com/missing.csv")
+    assert response.status_code == 400
+    assert "404" in response.json()["detail"]
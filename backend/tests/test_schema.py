@@ -0,0 +1,60 @@
+import pandas as pd
+
+from app.services.schema import (
+    CATEGORY, DATETIME, NUMERIC, STRING, conform_rows, infer_schema
+)
+
+
+def _kinds(**columns):
+    return infer_schema(pd.DataFrame(columns))[1]
+
+
+def test_dates_with_year_and_month_are_parsed():
+    df, kinds = infer_schema(pd.DataFrame({
+        "Date": ["2024-01-05", "2024-01-06", None],
+        "Stamp": ["05/01/2024 10:30", "06/01/2024 11:00", "07/01/2024 12:15"],
+    }))
+    assert kinds == {"Date": DATETIME, "Stamp": DATETIME}
+    assert df["Date"][1] == pd.Timestamp("2024-01-06")
+    assert df["Stamp"][2] == pd.Timestamp("2024-07-01 12:15")
+
+
+def test_text_without_a_year_is_not_a_date():
+    kinds = _kinds(
+        Month=["January", "February", "January", "February"],
+        Short=["Jan", "Feb", "Jan", "Feb"],
+        Time=["10:30", "11:00", "10:30", "11:00"],
+    )
+    assert kinds == {"Month": CATEGORY, "Short": CATEGORY, "Time": CATEGORY}
+
+
+def test_mixed_date_formats_are_not_a_date():
+    assert _kinds(Date=["2024-01-05", "05/01/2024", "2024-01-07"]) == {"Date": STRING}
+
+
+def test_canonical_numbers_are_parsed():
+    df, kinds = infer_schema(pd.DataFrame({"Amount": ["12", "-3", "4.5", None]}, dtype=object))
+    assert kinds == {"Amount": NUMERIC}
+    assert df["Amount"].tolist()[:3] == [12, -3, 4.5]
+
+
+def test_non_canonical_numbers_keep_their_text():
+    df, kinds = infer_schema(pd.DataFrame({
+        "Code": ["00123", "00456", "00123", "00456"],
+        "Price": ["1.50", "2.00", "1.50", "2.00"],
+        "Padded": [" 5", "6 ", "7", "8"],
+    }))
+    assert kinds == {"Code": CATEGORY, "Price": CATEGORY, "Padded": STRING}
+    assert df["Code"].tolist() == ["00123", "00456", "00123", "00456"]
+
+
+def test_conform_rows_uses_the_format_of_the_first_rows():
+    raw = pd.DataFrame({"Date": ["01/02/2024", "01/03/2024"], "Units": ["1", "2"]})
+    like, _ = infer_schema(raw.assign(Units=[1, 2]))
+
+    rows, _ = conform_rows(pd.DataFrame({"Date": ["01/04/2024"], "Units": ["3"]}), like, raw)
+    assert rows["Date"][0] == pd.Timestamp("2024-01-04")
+    assert rows["Units"][0] == 3
+
+    # Day-first text does not read in the month-first format of the column
+    assert conform_rows(pd.DataFrame({"Date": ["25/01/2024"], "Units": ["3"]}), like, raw) is None
@@ -0,0 +1,28 @@
+import threading
+
+import pandas as pd
+
+from app.services.shared_cache import SharedFrameStore
+
+
+def test_concurrent_puts_of_one_key(tmp_path):
+    store = SharedFrameStore(str(tmp_path / "shared"), max_bytes=1 << 30)
+    frame = pd.DataFrame({"Region": ["north", "south"] * 50_000, "Units": range(100_000)})
+    threads = [threading.Thread(target=store.put, args=("uploads/a.csv", 1.0, frame)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.writes == 4
+    assert not list((tmp_path / "shared").glob("*.tmp"))
+    loaded = store.get_or_load("uploads/a.csv", 1.0, lambda: None)
+    pd.testing.assert_frame_equal(loaded, frame)
+
+
+def test_new_version_replaces_the_old_one(tmp_path):
+    store = SharedFrameStore(str(tmp_path / "shared"), max_bytes=1 << 30)
+    store.put("uploads/a.csv", 1.0, pd.DataFrame({"Units": [1]}))
+    store.put("uploads/a.csv", 2.0, pd.DataFrame({"Units": [1, 2]}))
+    assert len(list((tmp_path / "shared").glob("*.arrow"))) == 1
+    assert store.get_or_load("uploads/a.csv", 2.0, lambda: None)["Units"].tolist() == [1, 2]
@@ -0,0 +1,38 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from app.services.data_processing import dataframe_payload
+from app.services.query_cache import encode_payload
+from app.services.streaming import stream_frame
+
+FRAME = pd.DataFrame({
+    "Date": pd.to_datetime(["2024-01-01", None, "2024-01-03"]),
+    "Product": ["A", None, "C"],
+    "Revenue": [1.5, np.nan, 3.0],
+})
+ROWS = [
+    ["2024-01-01T00:00:00", "A", 1.5],
+    [None, None, None],
+    ["2024-01-03T00:00:00", "C", 3.0],
+]
+
+
+def _body(format, **kwargs):
+    return b"".join(stream_frame(FRAME, format, **kwargs)).decode("utf-8")
+
+
+def test_ndjson_encodes_missing_values_as_null():
+    rows = [json.loads(line) for line in _body("ndjson").splitlines()]
+    assert [list(row.values()) for row in rows] == ROWS
+
+
+def test_split_encodes_missing_values_as_null():
+    body = json.loads(_body("split", offset=10, total_rows=13))
+    assert body == {"columns": ["Date", "Product", "Revenue"], "total_rows": 13, "offset": 10, "data": ROWS}
+
+
+def test_json_payload_encodes_missing_values_as_null():
+    body = json.loads(encode_payload(dataframe_payload(FRAME)))
+    assert [list(row.values()) for row in body["rows"]] == ROWS
@@ -0,0 +1,73 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+
+from app.services import ingest_jobs as ingest_jobs_module
+
+
+def _upload(client, name, content):
+    return client.post("/api/upload/", files={"file": (name, io.BytesIO(content), "text/csv")})
+
+
+def _finished(client, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/api/upload/jobs/{job_id}").json()
+        if job["state"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Ingest job {job_id} did not finish")
+
+
+def test_upload_is_previewed_then_ingested(client, sales):
+    content = sales.to_csv(index=False, date_format="%Y-%m-%d").encode()
+    response = _upload(client, "upload_sales.csv", content)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["preview"]["total_rows"] == len(sales)
+    assert body["job"]["estimated_rows"] == len(sales)
+
+    job = _finished(client, body["job"]["id"])
+    assert (job["state"], job["progress"], job["rows"], job["error"]) == ("done", 1.0, len(sales), None)
+
+
+def test_job_reports_parse_progress_and_failure(client, sales, monkeypatch):
+    halfway, release = threading.Event(), threading.Event()
+
+    def ingest_file(path, progress=None):
+        progress(50, 200)
+        halfway.set()
+        release.wait(10)
+        raise ValueError("row 3: unreadable")
+    monkeypatch.setattr(ingest_jobs_module, "ingest_file", ingest_file)
+
+    body = _upload(client, "upload_failing.csv", sales.to_csv(index=False).encode()).json()
+    assert halfway.wait(10)
+    job = client.get(f"/api/upload/jobs/{body['job']['id']}").json()
+    assert (job["state"], job["progress"]) == ("parsing", 0.25)
+
+    release.set()
+    job = _finished(client, body["job"]["id"])
+    assert (job["state"], job["error"], job["rows"]) == ("failed", "row 3: unreadable", None)
+    assert job["finished_at"] >= job["started_at"]
+
+
+@pytest.mark.parametrize("name, content", [
+    ("binary.csv", b"a,b\n1,\x00\n"),
+    ("latin1.csv", "name\ncaf\xe9\n".encode("latin-1")),
+    ("fake.xlsx", b"a,b\n1,2\n"),
+    ("empty.csv", b""),
+    ("notes.txt", b"a,b\n"),
+])
+def test_invalid_uploads_are_rejected(client, name, content):
+    response = _upload(client, name, content)
+    assert response.status_code == 400
+    # Neither the file nor its partial upload is kept
+    assert not [entry for entry in os.listdir("uploads") if entry.startswith(name)]
+
+
+def test_unknown_job(client):
+    assert client.get("/api/upload/jobs/missing").status_code == 404
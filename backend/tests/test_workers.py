@@ -0,0 +1,44 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from app.routers import datasources
+from app.services.workers import WorkerPool
+
+
+def test_admission_limits():
+    pool = WorkerPool("queries", workers=1, queue_limit=2, user_concurrency=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(pool.run("alice", release.wait))
+        await asyncio.sleep(0) # admitted
+        with pytest.raises(HTTPException) as same_user:
+            await pool.run("alice", lambda: None)
+
+        queued = asyncio.ensure_future(pool.run("bob", release.wait))
+        await asyncio.sleep(0) # admitted, waits for the worker
+        with pytest.raises(HTTPException) as busy:
+            await pool.run("carol", lambda: None)
+
+        release.set()
+        await asyncio.gather(running, queued)
+        return same_user.value, busy.value, await pool.run("alice", lambda: "done")
+
+    same_user, busy, after = asyncio.run(scenario())
+    assert same_user.status_code == 429
+    assert busy.status_code == 503
+    assert busy.headers["Retry-After"] == "1"
+    assert after == "done"
+    stats = pool.stats()
+    assert (stats["rejected_user"], stats["rejected_busy"], stats["completed"], stats["admitted"]) == (1, 1, 3, 0)
+
+
+def test_full_queue_answers_503(client, add_datasource, sales, monkeypatch):
+    id = add_datasource(sales, "workers_busy")
+    monkeypatch.setattr(datasources, "query_pool", WorkerPool("queries", workers=1, queue_limit=0, user_concurrency=4))
+    response = client.get(f"/api/datasources/{id}/data")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
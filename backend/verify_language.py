@@ -13,14 +13,18 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 load_dotenv("backend/.env")
 
 # Patch dependencies
-with patch("app.routers.ai.load_db") as mock_load_db, \
+with patch("app.routers.ai.get_datasource") as mock_get_datasource, \
      patch("app.routers.ai.get_full_data") as mock_get_full_data:
 
-    mock_load_db.return_value = [{"id": "test_ds", "path": "dummy_path"}]
+    mock_get_datasource.return_value = {"id": "test_ds", "path": "dummy_path"}
     df = pd.DataFrame({'Ventas': [100, 200, 300], 'Producto': ['A', 'B', 'C']})
     mock_get_full_data.return_value = df
 
     from app.main import app
+    from app.auth_utils import User, get_current_active_user
+
+    # /api/ai/chat requires a signed-in user
+    app.dependency_overrides[get_current_active_user] = lambda: User(username="verify", disabled=False)
     client = TestClient(app)
     
     print("--- Starting Language Verification ---")
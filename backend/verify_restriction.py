@@ -9,17 +9,17 @@ from fastapi.testclient import TestClient
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Mock dependencies BEFORE importing app/routers that might use them
-# We need to mock app.routers.ai.load_db and app.routers.ai.get_full_data
+# We need to mock app.routers.ai.get_datasource and app.routers.ai.get_full_data
 # But since we import app.main, which imports app.routers.ai, we need to patch specifically where they are used.
 from dotenv import load_dotenv
 load_dotenv("backend/.env")
 
 # It is easier to patch them in `app.routers.ai` namespace.
-with patch("app.routers.ai.load_db") as mock_load_db, \
+with patch("app.routers.ai.get_datasource") as mock_get_datasource, \
      patch("app.routers.ai.get_full_data") as mock_get_full_data:
 
     # Setup Mocks
-    mock_load_db.return_value = [{"id": "test_ds", "path": "dummy_path"}]
+    mock_get_datasource.return_value = {"id": "test_ds", "path": "dummy_path"}
     
     # Create a simple dataframe
     df = pd.DataFrame({'A': [1, 2, 3], 'B': [4, 5, 6]})
@@ -27,6 +27,10 @@ with patch("app.routers.ai.load_db") as mock_load_db, \
 
     # Import app AFTER mocks are ready (though we are patching the module usage, so it can be imported before potentially, but safe here)
     from app.main import app
+    from app.auth_utils import User, get_current_active_user
+
+    # /api/ai/chat requires a signed-in user
+    app.dependency_overrides[get_current_active_user] = lambda: User(username="verify", disabled=False)
     
     client = TestClient(app)
     
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { BarChart, Bar, LineChart, Line, AreaChart, Area, ComposedChart, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, Legend } from 'recharts';
+import { useAuth } from '../contexts/AuthContext';
 
 interface DashboardChartProps {
     chart: any;
@@ -7,9 +8,50 @@ interface DashboardChartProps {
     startDate?: string;
     endDate?: string;
     className?: string;
+    // Series preloaded by the section-level batch request (main, breakdown, breakdown_2)
+    sectionData?: any;
+    sectionLoading?: boolean;
 }
 
-export function DashboardChart({ chart, timeGrouping, startDate, endDate, className }: DashboardChartProps) {
+// Pivot breakdown rows from Long to Wide
+// received: rows: [{x: '...', breakdown: '...', y: 10}]
+// wanted: [{x: '...', 'catA': 10, 'catB': 20}]
+function pivotBreakdown(respData: any, xColumn: string, breakdownColumn: string, yColumn: string) {
+    if (!respData || !respData.rows) return null;
+
+    const pivoted: any = {};
+    const breakdownKeys = new Set<string>();
+
+    respData.rows.forEach((row: any) => {
+        const xVal = row[xColumn];
+        const breakdownVal = row[breakdownColumn] || 'Unknown';
+        const yVal = row[yColumn];
+
+        if (!pivoted[xVal]) {
+            pivoted[xVal] = { [xColumn]: xVal };
+        }
+        pivoted[xVal][breakdownVal] = yVal;
+        breakdownKeys.add(breakdownVal);
+    });
+
+    const pivotedList = Object.values(pivoted);
+    // The backend sorts by sort_by, but object key order isn't guaranteed once pivoted
+    pivotedList.sort((a: any, b: any) => {
+        if (a[xColumn] < b[xColumn]) return -1;
+        if (a[xColumn] > b[xColumn]) return 1;
+        return 0;
+    });
+
+    return {
+        rows: pivotedList,
+        keys: Array.from(breakdownKeys).sort(),
+        // Series such as the capped "Other" that no filter_value can select
+        nonFilterable: respData.non_filterable?.[breakdownColumn] || []
+    };
+}
+
+export function DashboardChart({ chart, timeGrouping, startDate, endDate, className, sectionData, sectionLoading }: DashboardChartProps) {
+    const { authFetch } = useAuth();
 
     const [data, setData] = useState<any>(null);
     const [breakdownData, setBreakdownData] = useState<any>(null);
@@ -21,6 +63,17 @@ export function DashboardChart({ chart, timeGrouping, startDate, endDate, classN
     const [breakdownLoading2, setBreakdownLoading2] = useState(false);
 
     useEffect(() => {
+        // Batched mode: the section already fetched every series of this chart
+        if (sectionData !== undefined || sectionLoading) {
+            setLoading(!!sectionLoading);
+            if (sectionLoading) return;
+            setData(sectionData?.main?.rows ? sectionData.main : null);
+            setBreakdownData(chart.breakdown_x_column
+                ? pivotBreakdown(sectionData?.breakdown, chart.x_column, chart.breakdown_x_column, chart.y_column)
+                : null);
+            return;
+        }
+
         let url = `http://localhost:8000/api/datasources/${chart.datasource_id}/data?sort_by=${chart.x_column}&x_column=${chart.x_column}&y_column=${chart.y_column}&group_by=${timeGrouping || 'day'}`;
 
         // If date_column is not set, try to use x_column if it seems to be a date-based chart
@@ -40,7 +93,7 @@ export function DashboardChart({ chart, timeGrouping, startDate, endDate, classN
 
 
         setLoading(true);
-        fetch(url)
+        authFetch(url)
             .then(res => res.json())
             .then(data => setData(data))
             .catch(err => console.error(err))
@@ -58,47 +111,11 @@ export function DashboardChart({ chart, timeGrouping, startDate, endDate, classN
             }
 
             setBreakdownLoading(true);
-            fetch(breakdownUrl)
+            authFetch(breakdownUrl)
                 .then(res => res.json())
                 .then(respData => {
-                    // Process Data: Pivot from Long to Wide
-                    // received: rows: [{x: '...', breakdown: '...', y: 10}]
-                    // wanted: [{x: '...', 'catA': 10, 'catB': 20}]
-
-                    if (!respData.rows) return;
-
-                    const rows = respData.rows;
-                    const pivoted: any = {};
-                    const breakdownKeys = new Set<string>();
-
-                    rows.forEach((row: any) => {
-                        const xVal = row[chart.x_column];
-                        const breakdownVal = row[chart.breakdown_x_column] || 'Unknown';
-                        const yVal = row[chart.y_column];
-
-                        if (!pivoted[xVal]) {
-                            pivoted[xVal] = { [chart.x_column]: xVal };
-                        }
-                        pivoted[xVal][breakdownVal] = yVal;
-                        breakdownKeys.add(breakdownVal);
-                    });
-
-                    const pivotedList = Object.values(pivoted);
-                    // Sort if needed (assuming x_column sort from backend is roughly preserved or we rely on re-sorting?)
-                    // The backend sorts by sort_by. If pivoted, object keys order isn't guaranteed. 
-                    // Best to sort pivotedList by x_column.
-                    pivotedList.sort((a: any, b: any) => {
-                        if (a[chart.x_column] < b[chart.x_column]) return -1;
-                        if (a[chart.x_column] > b[chart.x_column]) return 1;
-                        return 0;
-                    });
-
-                    const sortedKeys = Array.from(breakdownKeys).sort();
-
-                    setBreakdownData({
-                        rows: pivotedList,
-                        keys: sortedKeys
-                    });
+                    const pivotedData = pivotBreakdown(respData, chart.x_column, chart.breakdown_x_column, chart.y_column);
+                    if (pivotedData) setBreakdownData(pivotedData);
                 })
                 .catch(err => console.error("Breakdown fetch error", err))
                 .finally(() => setBreakdownLoading(false));
@@ -107,10 +124,18 @@ export function DashboardChart({ chart, timeGrouping, startDate, endDate, classN
             setBreakdownData(null);
         }
 
-    }, [chart.datasource_id, chart.date_column, chart.x_column, chart.y_column, chart.breakdown_x_column, timeGrouping, startDate, endDate]);
+    }, [chart.datasource_id, chart.date_column, chart.x_column, chart.y_column, chart.breakdown_x_column, timeGrouping, startDate, endDate, sectionData, sectionLoading]);
 
     // Fetch Second Breakdown Data (Cascading)
     useEffect(() => {
+        // Batched mode: only a cascading selection needs its own request
+        if (chart.breakdown_x_column_2 && !selectedBreakdown && (sectionData !== undefined || sectionLoading)) {
+            if (!sectionLoading) {
+                setBreakdownData2(pivotBreakdown(sectionData?.breakdown_2, chart.x_column, chart.breakdown_x_column_2, chart.y_column));
+            }
+            return;
+        }
+
         if (chart.breakdown_x_column_2) {
             let breakdownUrl2 = `http://localhost:8000/api/datasources/${chart.datasource_id}/data?sort_by=${chart.x_column}&x_column=${chart.x_column}&y_column=${chart.y_column}&group_by=${timeGrouping || 'day'}&breakdown_column=${chart.breakdown_x_column_2}`;
 
@@ -127,43 +152,10 @@ export function DashboardChart({ chart, timeGrouping, startDate, endDate, classN
             }
 
             setBreakdownLoading2(true);
-            fetch(breakdownUrl2)
+            authFetch(breakdownUrl2)
                 .then(res => res.json())
                 .then(respData => {
-                    if (!respData.rows) {
-                        setBreakdownData2(null);
-                        return;
-                    }
-
-                    const rows = respData.rows;
-                    const pivoted: any = {};
-                    const breakdownKeys = new Set<string>();
-
-                    rows.forEach((row: any) => {
-                        const xVal = row[chart.x_column];
-                        const breakdownVal = row[chart.breakdown_x_column_2] || 'Unknown';
-                        const yVal = row[chart.y_column];
-
-                        if (!pivoted[xVal]) {
-                            pivoted[xVal] = { [chart.x_column]: xVal };
-                        }
-                        pivoted[xVal][breakdownVal] = yVal;
-                        breakdownKeys.add(breakdownVal);
-                    });
-
-                    const pivotedList = Object.values(pivoted);
-                    pivotedList.sort((a: any, b: any) => {
-                        if (a[chart.x_column] < b[chart.x_column]) return -1;
-                        if (a[chart.x_column] > b[chart.x_column]) return 1;
-                        return 0;
-                    });
-
-                    const sortedKeys = Array.from(breakdownKeys).sort();
-
-                    setBreakdownData2({
-                        rows: pivotedList,
-                        keys: sortedKeys
-                    });
+                    setBreakdownData2(pivotBreakdown(respData, chart.x_column, chart.breakdown_x_column_2, chart.y_column));
                 })
                 .catch(err => console.error("Breakdown 2 fetch error", err))
                 .finally(() => setBreakdownLoading2(false));
@@ -171,7 +163,13 @@ export function DashboardChart({ chart, timeGrouping, startDate, endDate, classN
         } else {
             setBreakdownData2(null);
         }
-    }, [chart.datasource_id, chart.date_column, chart.x_column, chart.y_column, chart.breakdown_x_column, chart.breakdown_x_column_2, timeGrouping, startDate, endDate, selectedBreakdown]);
+    }, [chart.datasource_id, chart.date_column, chart.x_column, chart.y_column, chart.breakdown_x_column, chart.breakdown_x_column_2, timeGrouping, startDate, endDate, selectedBreakdown, sectionData, sectionLoading]);
+
+    // Selecting a series filters the second breakdown by its value
+    const toggleBreakdown = (key: string) => {
+        if (breakdownData?.nonFilterable.includes(key)) return;
+        setSelectedBreakdown(prev => prev === key ? null : key);
+    };
 
     // Reset second selection when first selection changes
     useEffect(() => {
@@ -342,7 +340,7 @@ export function DashboardChart({ chart, timeGrouping, startDate, endDate, classN
                                 <Tooltip contentStyle={{ borderRadius: '8px', border: 'none', boxShadow: '0 4px 6px -1px rgba(0, 0, 0, 0.1)' }} labelFormatter={formatDate} />
                                 <Legend
                                     wrapperStyle={{ fontSize: '10px', cursor: 'pointer' }}
-                                    onClick={(e: any) => setSelectedBreakdown(prev => prev === e.dataKey ? null : e.dataKey)}
+                                    onClick={(e: any) => toggleBreakdown(e.dataKey)}
                                 />
                                 {breakdownData.keys
                                     .filter((key: string) => !selectedBreakdown || key === selectedBreakdown)
@@ -359,8 +357,8 @@ export function DashboardChart({ chart, timeGrouping, startDate, endDate, classN
                                                 strokeWidth={1.5}
                                                 name={key}
                                                 radius={[0, 0, 0, 0]}
-                                                cursor="pointer"
-                                                onClick={() => setSelectedBreakdown(prev => prev === key ? null : key)}
+                                                cursor={breakdownData.nonFilterable.includes(key) ? 'default' : 'pointer'}
+                                                onClick={() => toggleBreakdown(key)}
                                             />
                                         );
                                     })}
@@ -49,6 +49,8 @@ const translations: Record<Language, Record<string, string>> = {
         'period.day': 'Day',
         'period.week': 'Week',
         'period.month': 'Month',
+        'period.quarter': 'Quarter',
+        'period.year': 'Year',
         'common.start': 'Start Date',
         'common.end': 'End Date',
         'common.clear': 'Clear',
@@ -94,6 +96,8 @@ const translations: Record<Language, Record<string, string>> = {
         'period.day': 'Día',
         'period.week': 'Semana',
         'period.month': 'Mes',
+        'period.quarter': 'Trimestre',
+        'period.year': 'Año',
         'common.start': 'Fecha Inicio',
         'common.end': 'Fecha Fin',
         'common.clear': 'Limpiar',
@@ -3,12 +3,14 @@ import { DashboardChart } from '../components/DashboardChart';
 import { Link, useParams, useNavigate } from 'react-router-dom';
 import { PlusCircle } from 'lucide-react';
 import { useDashboard } from '../contexts/DashboardContext';
+import { useAuth } from '../contexts/AuthContext';
 import { useLanguage } from '../contexts/LanguageContext';
 
 export function Dashboard() {
     const { sectionId } = useParams();
     const navigate = useNavigate();
     const { sections } = useDashboard();
+    const { authFetch } = useAuth();
     const { t } = useLanguage();
 
     // Date Range State
@@ -76,6 +78,35 @@ export function Dashboard() {
     // Grouping State
     const [timeGrouping, setTimeGrouping] = useState('day');
 
+    // Batched Section Data: one request returns every series of every chart
+    const [sectionData, setSectionData] = useState<any>(null);
+    const [sectionLoading, setSectionLoading] = useState(true);
+
+    useEffect(() => {
+        if (!sectionId) return;
+
+        let cancelled = false;
+        setSectionLoading(true);
+        authFetch(`http://localhost:8000/api/dashboard/sections/${sectionId}/data`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                start_date: startDate || null,
+                end_date: endDate || null,
+                group_by: timeGrouping
+            })
+        })
+            .then(res => res.json())
+            .then(data => { if (!cancelled) setSectionData(data.charts || {}); })
+            .catch(err => {
+                console.error("Section data fetch error", err);
+                if (!cancelled) setSectionData({});
+            })
+            .finally(() => { if (!cancelled) setSectionLoading(false); });
+
+        return () => { cancelled = true; };
+    }, [sectionId, sections, startDate, endDate, timeGrouping]);
+
     // Redirect to first section if no ID provided and sections exist
     useEffect(() => {
         if (!sectionId && sections.length > 0) {
@@ -143,6 +174,8 @@ export function Dashboard() {
                             <option value="day">{t('period.day')}</option>
                             <option value="week">{t('period.week')}</option>
                             <option value="month">{t('period.month')}</option>
+                            <option value="quarter">{t('period.quarter')}</option>
+                            <option value="year">{t('period.year')}</option>
                         </select>
                     </div>
 
@@ -207,6 +240,8 @@ export function Dashboard() {
                                     startDate={startDate}
                                     endDate={endDate}
                                     className={section.layout_columns === 1 ? 'min-h-[85vh]' : ''}
+                                    sectionData={sectionData?.[chart.id] ?? null}
+                                    sectionLoading={sectionLoading}
                                 />
                             ))
                         ) : (